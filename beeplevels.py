@@ -0,0 +1,94 @@
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+# Tabela de níveis de beep pré-compilada: os limiares são validados e ordenados
+# uma única vez e cada consulta é uma pesquisa binária (bisect / np.searchsorted).
+# As regras de fronteira reproduzem as variantes existentes mesmo com níveis fora
+# de ordem, porque guardam o índice original de cada limiar:
+#   "floor" - maior i com levels[i] <= distância, 0 se nenhum
+#             (get_beep_level_with_fault_tolerance de qcsfr4.py / teste3.py)
+#   "ceil"  - menor i com distância <= levels[i], 'overflow' se nenhum
+#             (teste2majorityvoting.py e as versões sem fault tolerance, overflow = len(levels);
+#              calcular_nivel_beep de teste.py, overflow = len(levels) - 1)
+
+RULES = ("floor", "ceil")
+
+
+class BeepLevelTable:
+    """
+    Parâmetros:
+        levels (list): limiares de distância dos níveis de beep
+        rule (str): "floor" ou "ceil" (ver acima)
+        overflow (int): nível devolvido pela regra "ceil" quando a distância excede todos
+                        os limiares (por omissão len(levels))
+    """
+
+    def __init__(self, levels, rule="floor", overflow=None):
+        if rule not in RULES:
+            raise ValueError(f"rule deve ser uma de {RULES}")
+        if not isinstance(levels, (list, tuple)):
+            raise ValueError("levels deve ser uma lista")
+        if not all(isinstance(l, (int, float)) and l >= 0 for l in levels):
+            raise ValueError("levels deve conter apenas números positivos")
+        self.levels = tuple(levels)
+        self.source = list(levels) if isinstance(levels, list) else self.levels  # comparável com o argumento
+        self.rule = rule
+        self.overflow = len(levels) if overflow is None else overflow
+        order = sorted(range(len(levels)), key=lambda i: levels[i])
+        self.thresholds = [levels[i] for i in order]
+        if rule == "floor":
+            # melhor índice entre os limiares <= distância: máximo de um prefixo da ordem
+            best, running = [], -1
+            for i in order:
+                running = max(running, i)
+                best.append(running)
+            self._answers = [0] + best  # posição bisect_right(thresholds, d)
+        else:
+            # melhor índice entre os limiares >= distância: mínimo de um sufixo da ordem
+            best, running = [], len(levels)
+            for i in reversed(order):
+                running = min(running, i)
+                best.append(running)
+            best.reverse()
+            self._answers = best + [self.overflow]  # posição bisect_left(thresholds, d)
+        self._thresholds_array = np.asarray(self.thresholds, dtype=np.float64)
+        self._answers_array = np.asarray(self._answers, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.levels)
+
+    def lookup(self, distance):
+        """Devolve o beep level de uma distância."""
+        if self.rule == "floor":
+            return self._answers[bisect_right(self.thresholds, distance)]
+        return self._answers[bisect_left(self.thresholds, distance)]
+
+    def lookup_array(self, distances):
+        """Devolve os beep levels de um array de distâncias (np.searchsorted)."""
+        side = "right" if self.rule == "floor" else "left"
+        return self._answers_array[np.searchsorted(self._thresholds_array, distances, side=side)]
+
+
+_tables = {}
+_last = {}  # (rule, overflow) -> última tabela usada, para os frames seguintes
+
+
+def level_table(levels, rule="floor", overflow=None):
+    """
+    Devolve a tabela compilada para estes níveis, reutilizando-a entre chamadas.
+
+    Os níveis só são validados quando a tabela é compilada (ValueError se forem
+    inválidos); nos frames seguintes com os mesmos níveis basta uma comparação de listas,
+    sem construir nem fazer hash de um tuplo.
+    """
+    table = _last.get((rule, overflow))
+    if table is not None and table.source == levels:
+        return table
+    key = (tuple(levels), rule, overflow)
+    table = _tables.get(key)
+    if table is None:
+        if len(_tables) >= 256:
+            _tables.clear()
+        table = _tables[key] = BeepLevelTable(levels, rule, overflow)
+    _last[rule, overflow] = table
+    return table
@@ -0,0 +1,278 @@
+import numpy as np
+from teste3 import KalmanFilter, KalmanFilterBank
+from beeplevels import BeepLevelTable
+from voting import majority_voting_array
+from sensorframe import validate_frames, check_crc
+
+# Pipeline de longa duração para o parking assist (FR4).
+# Ao contrário de get_beep_level_with_fault_tolerance, que cria filtros novos a
+# cada chamada, o pipeline mantém um filtro de Kalman e a última leitura válida
+# por grupo de sensores entre frames, para que os filtros convirjam.
+
+
+def vote3(a, b, c):
+    """Majority voting de 3 leituras sem alocar listas; sem maioria devolve a mediana."""
+    if a == b or a == c:
+        return a
+    if b == c:
+        return b
+    return max(min(a, b), min(max(a, b), c))
+
+
+class BeepPipeline:
+    """
+    Processa um fluxo de frames de sensores e devolve um beep level por frame.
+
+    Cada frame é uma sequência plana com 3 leituras por grupo de sensores
+    (o mesmo formato de get_beep_level_with_fault_tolerance). Por frame:
+    majority voting em cada grupo, recuperação com a última leitura válida do
+    grupo, filtro de Kalman persistente, rejeição de outliers e escolha do nível.
+
+    Parâmetros:
+        levels (list): níveis de beep, validados e compilados uma única vez (BeepLevelTable)
+        groups (int): número de grupos de 3 sensores por frame
+        max_change (float): desvio máximo em relação à mediana antes de uma leitura ser outlier
+        valid_range (tuple): intervalo de leituras aceites antes de usar a última válida
+        initial_distance (float): valor de recurso inicial de cada grupo
+    """
+
+    def __init__(self, levels, groups, max_change=50, valid_range=(0, 100), initial_distance=50,
+                 process_variance=1e-5, measurement_variance=1e-2):
+        if not isinstance(levels, (list, tuple)) or len(levels) == 0:
+            raise ValueError("levels deve ser uma lista não vazia")
+        if groups <= 0:
+            raise ValueError("groups deve ser positivo")
+        self.levels = BeepLevelTable(levels, "floor")
+        self.groups = groups
+        self.size = groups * 3
+        self.max_change = max_change
+        self.low, self.high = valid_range
+        self.filters = [KalmanFilter(process_variance, measurement_variance) for _ in range(groups)]
+        self.last_valid = [initial_distance] * groups
+        # buffers reutilizados em todos os frames
+        self._smoothed = [0.0] * groups
+        self._sorted = [0.0] * groups
+        self.frames = 0
+
+    def process(self, frame):
+        """Processa um frame e devolve o beep level (-1 se o frame for inválido)."""
+        if len(frame) != self.size:
+            return -1
+        smoothed = self._smoothed
+        last_valid = self.last_valid
+        filters = self.filters
+        low, high = self.low, self.high
+        # 1ª passagem: voting; um frame inválido não altera o estado dos filtros
+        try:
+            for g in range(self.groups):
+                i = g * 3
+                a, b, c = frame[i], frame[i + 1], frame[i + 2]
+                if a < 0 or b < 0 or c < 0:
+                    return -1
+                smoothed[g] = vote3(a, b, c)
+        except TypeError:
+            return -1  # leitura não numérica
+        # 2ª passagem: Backward Recovery por grupo e filtro de Kalman
+        for g in range(self.groups):
+            distance = smoothed[g]
+            if low <= distance <= high:
+                last_valid[g] = distance
+            else:
+                distance = last_valid[g]
+            smoothed[g] = filters[g].update(distance)
+        self.frames += 1
+
+        # **OUTLIER DETECTION** - mediana sobre um buffer pré-alocado
+        ordered = self._sorted
+        ordered[:] = smoothed
+        ordered.sort()
+        n = self.groups
+        median = ordered[n // 2] if n % 2 else (ordered[n // 2 - 1] + ordered[n // 2]) / 2
+        max_change = self.max_change
+        valid = 0
+        min_distance = None
+        for d in smoothed:
+            if abs(d - median) <= max_change:
+                valid += 1
+                if min_distance is None or d < min_distance:
+                    min_distance = d
+        if valid < n // 2 or min_distance is None:
+            return -1
+
+        return self.levels.lookup(min_distance)
+
+    def process_batch(self, frames):
+        """
+        Processa um lote de frames de uma só vez e devolve um array de beep levels.
+
+        'frames' é um array de frames estruturados (sensorframe.frame_dtype), validado com
+        uma única verificação de dtype e de CRC, ou um array numérico (T x 3*grupos).
+        O resultado é o mesmo que chamar process frame a frame.
+        """
+        if isinstance(frames, np.ndarray) and frames.dtype.names:
+            validate_frames(frames, self.groups)
+            readings = frames["readings"].reshape(len(frames), self.size)
+            usable = check_crc(frames)
+        else:
+            readings = np.asarray(frames, dtype=np.float64)
+            if readings.ndim != 2 or readings.shape[1] != self.size:
+                return np.full(len(readings), -1, dtype=np.int64)
+            usable = np.ones(len(readings), dtype=bool)
+        levels = np.full(len(readings), -1, dtype=np.int64)
+        usable &= (readings >= 0).all(axis=1)
+        readings = readings[usable]
+        if not len(readings):
+            return levels
+
+        # Voting vetorizado sobre todos os grupos de todos os frames
+        distances = majority_voting_array(readings.reshape(-1, 3)).astype(np.float64).reshape(-1, self.groups)
+
+        # Backward Recovery: leituras fora do intervalo tomam a última válida do grupo
+        in_range = (distances >= self.low) & (distances <= self.high)
+        steps = np.arange(len(distances))[:, None]
+        last_index = np.maximum.accumulate(np.where(in_range, steps, -1), axis=0)
+        initial = np.asarray(self.last_valid, dtype=np.float64)
+        filled = np.where(last_index >= 0, np.take_along_axis(distances, np.maximum(last_index, 0), axis=0), initial)
+        self.last_valid = np.where(last_index[-1] >= 0, filled[-1], initial).tolist()
+
+        # Filtros de Kalman: o mesmo estado dos filtros escalares, atualizado pelo banco
+        bank = KalmanFilterBank(self.groups, self.filters[0].process_variance, self.filters[0].measurement_variance)
+        bank.estimates = np.array([f.estimate for f in self.filters])
+        bank.error_covariances = np.array([f.error_covariance for f in self.filters])
+        smoothed = bank.filter_series(filled)
+        for f, estimate, covariance in zip(self.filters, bank.estimates.tolist(), bank.error_covariances.tolist()):
+            f.estimate, f.error_covariance = estimate, covariance
+        self.frames += len(smoothed)
+
+        # Outliers em relação à mediana de cada frame e nível da menor distância válida
+        median = np.median(smoothed, axis=1)
+        valid = np.abs(smoothed - median[:, None]) <= self.max_change
+        min_distance = np.where(valid, smoothed, np.inf).min(axis=1)
+        ok = valid.sum(axis=1) >= self.groups // 2
+        levels[np.flatnonzero(usable)[ok]] = self.levels.lookup_array(min_distance[ok])
+        return levels
+
+    def run(self, frames):
+        """
+        Gerador: consome um iterável de frames e produz um beep level por frame.
+        Um elemento que seja um array de frames estruturados é processado como um lote.
+        """
+        process = self.process
+        for frame in frames:
+            if isinstance(frame, np.ndarray) and frame.dtype.names:
+                yield from self.process_batch(frame).tolist()
+            else:
+                yield process(frame)
+
+    async def arun(self, frames):
+        """Versão assíncrona de run para um async iterator de frames."""
+        process = self.process
+        async for frame in frames:
+            if isinstance(frame, np.ndarray) and frame.dtype.names:
+                for level in self.process_batch(frame).tolist():
+                    yield level
+            else:
+                yield process(frame)
+
+
+class MultiStreamPipeline:
+    """
+    O mesmo processamento de BeepPipeline.process para muitos fluxos (veículos) de uma vez.
+
+    O estado (última leitura válida e filtro de Kalman de cada grupo) fica em arrays
+    (fluxos x grupos), uma linha por id de fluxo; process_frames trata todos os frames
+    recebidos num tick numa única passagem vetorizada. Frames do mesmo fluxo no mesmo
+    lote são aplicados por ordem de chegada. Para cada fluxo o resultado é igual ao de
+    um BeepPipeline dedicado.
+    """
+
+    def __init__(self, levels, groups, max_change=50, valid_range=(0, 100), initial_distance=50,
+                 process_variance=1e-5, measurement_variance=1e-2, capacity=64):
+        if not isinstance(levels, (list, tuple)) or len(levels) == 0:
+            raise ValueError("levels deve ser uma lista não vazia")
+        if groups <= 0:
+            raise ValueError("groups deve ser positivo")
+        self.levels = BeepLevelTable(levels, "floor")
+        self.groups = groups
+        self.max_change = max_change
+        self.low, self.high = valid_range
+        self.initial_distance = initial_distance
+        self.process_variance = process_variance
+        self.measurement_variance = measurement_variance
+        self.rows = {}  # id do fluxo -> linha dos arrays de estado
+        self.last_valid = np.full((capacity, groups), float(initial_distance))
+        self.estimates = np.zeros((capacity, groups))
+        self.error_covariances = np.ones((capacity, groups))
+        self.frames = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _rows_for(self, streams):
+        """Linhas de estado dos fluxos (criadas na primeira vez que um fluxo aparece)."""
+        rows = self.rows
+        unique, inverse = np.unique(streams, return_inverse=True)
+        new = [int(s) for s in unique.tolist() if s not in rows]
+        if new:
+            needed = len(rows) + len(new)
+            if needed > len(self.last_valid):
+                capacity = max(needed, 2 * len(self.last_valid))
+                extra = capacity - len(self.last_valid)
+                self.last_valid = np.vstack([self.last_valid, np.full((extra, self.groups), float(self.initial_distance))])
+                self.estimates = np.vstack([self.estimates, np.zeros((extra, self.groups))])
+                self.error_covariances = np.vstack([self.error_covariances, np.ones((extra, self.groups))])
+            for s in new:
+                rows[s] = len(rows)
+        return np.array([rows[s] for s in unique.tolist()], dtype=np.intp)[inverse]
+
+    def process_frames(self, frames):
+        """
+        Processa um lote de frames estruturados (sensorframe.frame_dtype) de vários fluxos,
+        identificados pelo campo 'stream'. Devolve um array com um beep level por frame.
+        """
+        validate_frames(frames, self.groups)
+        count = len(frames)
+        levels = np.full(count, -1, dtype=np.int64)
+        if not count:
+            return levels
+        readings = frames["readings"].reshape(count, -1)
+        usable = check_crc(frames) & (readings >= 0).all(axis=1)
+        index = np.flatnonzero(usable)
+        if not len(index):
+            return levels
+        rows = self._rows_for(frames["stream"][index])
+
+        # k-ésimo frame de cada fluxo neste lote -> k-ésima ronda (normalmente só uma)
+        order = np.argsort(rows, kind="stable")
+        sorted_rows = rows[order]
+        first = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+        occurrence = np.empty(len(rows), dtype=np.intp)
+        occurrence[order] = np.arange(len(rows)) - np.repeat(first, np.diff(np.r_[first, len(rows)]))
+        for k in range(int(occurrence.max()) + 1):
+            selected = np.flatnonzero(occurrence == k)
+            levels[index[selected]] = self._step(rows[selected], readings[index[selected]])
+        self.frames += len(index)
+        return levels
+
+    def _step(self, rows, readings):
+        """Um frame por fluxo: voting, Backward Recovery, Kalman, outliers e nível."""
+        distances = majority_voting_array(readings.reshape(-1, 3)).astype(np.float64).reshape(-1, self.groups)
+        in_range = (distances >= self.low) & (distances <= self.high)
+        last_valid = np.where(in_range, distances, self.last_valid[rows])
+        self.last_valid[rows] = last_valid
+
+        # Kalman: as mesmas equações de KalmanFilterBank.update, uma linha por fluxo
+        estimates = self.estimates[rows]
+        predicted = self.error_covariances[rows] + self.process_variance
+        gain = predicted / (predicted + self.measurement_variance)
+        estimates += gain * (last_valid - estimates)
+        self.estimates[rows] = estimates
+        self.error_covariances[rows] = (1 - gain) * predicted
+
+        median = np.median(estimates, axis=1)
+        valid = np.abs(estimates - median[:, None]) <= self.max_change
+        min_distance = np.where(valid, estimates, np.inf).min(axis=1)
+        ok = valid.sum(axis=1) >= self.groups // 2
+        levels = np.full(len(rows), -1, dtype=np.int64)
+        levels[ok] = self.levels.lookup_array(min_distance[ok])
+        return levels
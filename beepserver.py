@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import struct
+import time
+import numpy as np
+from beeppipeline import MultiStreamPipeline
+from sensorframe import frame_dtype, frames_from_buffer
+
+# Servidor local de beep levels para muitos veículos num único processo (FR4).
+# Cada ligação envia pacotes de frames (sensorframe.frame_dtype, com o id do fluxo e
+# o CRC de cada frame). Os pacotes recebidos durante um tick de todas as ligações
+# são juntos e processados numa única passagem vetorizada (MultiStreamPipeline);
+# cada pacote recebe de volta um beep level por frame.
+#
+# Pacote:   <u4 número de frames> + frames
+# Resposta: <u4 número de frames> + um <i2 por frame (-1 = frame inválido)
+
+HEADER = struct.Struct("<I")
+LEVEL_DTYPE = np.dtype("<i2")
+
+
+async def read_packet(reader, groups):
+    """Lê um pacote de frames; devolve None quando a ligação é fechada."""
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    count, = HEADER.unpack(header)
+    payload = await reader.readexactly(count * frame_dtype(groups).itemsize)
+    return frames_from_buffer(payload, groups, count=count)
+
+
+def encode_packet(frames):
+    return HEADER.pack(len(frames)) + frames.tobytes()
+
+
+def encode_levels(levels):
+    return HEADER.pack(len(levels)) + np.asarray(levels, dtype=LEVEL_DTYPE).tobytes()
+
+
+async def read_levels(reader):
+    count, = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return np.frombuffer(await reader.readexactly(count * LEVEL_DTYPE.itemsize), dtype=LEVEL_DTYPE)
+
+
+class BeepServer:
+    """
+    Agrupa os pacotes de todas as ligações por tick e responde a cada um.
+
+    Parâmetros:
+        levels (list): níveis de beep
+        groups (int): grupos de 3 sensores por frame
+        tick (float): tempo máximo (s) que um pacote espera pelo lote seguinte
+        max_batch (int): número de frames que fecha um lote antes do fim do tick
+    """
+
+    def __init__(self, levels, groups, tick=0.001, max_batch=8192, **pipeline_options):
+        self.groups = groups
+        self.tick = tick
+        self.max_batch = max_batch
+        self.pipeline = MultiStreamPipeline(levels, groups, **pipeline_options)
+        self._pending = []
+        self._pending_frames = 0
+        self._wakeup = None
+        self._full = None
+        self.ticks = 0
+        self.frames = 0
+        self.busy = 0.0  # tempo gasto a processar lotes
+
+    async def submit(self, frames):
+        """Junta 'frames' ao próximo lote e espera pelos beep levels."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((frames, future))
+        self._pending_frames += len(frames)
+        self._wakeup.set()
+        if self._pending_frames >= self.max_batch:
+            self._full.set()
+        return await future
+
+    async def _batcher(self):
+        while True:
+            await self._wakeup.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.tick)
+            except asyncio.TimeoutError:
+                pass
+            pending, self._pending, self._pending_frames = self._pending, [], 0
+            self._wakeup.clear()
+            self._full.clear()
+            if pending:
+                self._run_batch(pending)
+
+    def _run_batch(self, pending):
+        start = time.perf_counter()
+        try:
+            frames = np.concatenate([frames for frames, _ in pending])
+            levels = self.pipeline.process_frames(frames)
+        except Exception as error:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        offset = 0
+        for packet, future in pending:
+            if not future.done():
+                future.set_result(levels[offset:offset + len(packet)])
+            offset += len(packet)
+        self.ticks += 1
+        self.frames += len(levels)
+        self.busy += time.perf_counter() - start
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                frames = await read_packet(reader, self.groups)
+                if frames is None:
+                    break
+                try:
+                    levels = await self.submit(frames)
+                except ValueError:
+                    levels = np.full(len(frames), -1)
+                writer.write(encode_levels(levels))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8765, path=None):
+        """Inicia o servidor (TCP em localhost, ou um Unix socket se 'path' for dado)."""
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._batcher_task = asyncio.ensure_future(self._batcher())
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path=path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self._batcher_task.cancel()
+        await asyncio.gather(self._batcher_task, return_exceptions=True)
+
+    async def serve_forever(self, host="127.0.0.1", port=8765, path=None):
+        await self.start(host, port, path)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+
+class BeepClient:
+    """Cliente de um servidor BeepServer (uma ligação, pedidos sequenciais)."""
+
+    def __init__(self, groups):
+        self.groups = groups
+
+    async def connect(self, host="127.0.0.1", port=8765, path=None):
+        if path is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+        return self
+
+    async def evaluate(self, frames):
+        self.writer.write(encode_packet(frames))
+        await self.writer.drain()
+        return await read_levels(self.reader)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Servidor de beep levels para vários veículos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="caminho de um Unix socket (em vez de TCP)")
+    parser.add_argument("--groups", type=int, default=3)
+    parser.add_argument("--levels", type=float, nargs="+", default=[5, 10, 20, 40, 70])
+    parser.add_argument("--tick", type=float, default=0.001)
+    args = parser.parse_args()
+    server = BeepServer(args.levels, args.groups, tick=args.tick)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
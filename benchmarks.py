@@ -0,0 +1,265 @@
+import argparse
+import os
+import time
+
+
+def _best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_rs(size_mb=0.5, repeat=3):
+    """Reed-Solomon encode/decode throughput (MB/s): single RSCodec call vs ChunkedRSCodec."""
+    from reedsolo import RSCodec
+    from chunkedrs import ChunkedRSCodec
+
+    data = bytearray(os.urandom(int(size_mb * 1e6)))
+    mb = len(data) / 1e6
+    print(f"Reed-Solomon, nsym=10, payload {mb:.2f} MB, {os.cpu_count()} CPUs")
+
+    rs = RSCodec(10)
+    encoded = rs.encode(data)
+    encode_time = _best_of(lambda: rs.encode(data), 1)
+    decode_time = _best_of(lambda: rs.decode(encoded), 1)
+    print(f"  {'RSCodec single call':<28} encode {mb / encode_time:8.2f} MB/s   decode {mb / decode_time:8.2f} MB/s")
+
+    for pool in (None, "thread", "process"):
+        codec = ChunkedRSCodec(10, pool=pool)
+        out = bytearray(codec.encoded_size(len(data)))
+        decoded = bytearray(len(data))
+        codec.encode(data, out)  # warm up the pool
+        encode_time = _best_of(lambda: codec.encode(data, out), repeat)
+        decode_time = _best_of(lambda: codec.decode(out, decoded), repeat)
+        assert out == encoded and decoded == data
+        label = f"ChunkedRSCodec pool={pool}"
+        print(f"  {label:<28} encode {mb / encode_time:8.2f} MB/s   decode {mb / decode_time:8.2f} MB/s")
+
+
+def bench_watchdog(calls=2000):
+    """Per-call overhead of WatchdogTimer: one new thread per call vs the persistent pool."""
+    import threading
+    from qcsfr5 import WatchdogTimer
+
+    def thread_per_call():
+        result = [None]
+
+        def wrapper():
+            result[0] = len(result)
+
+        thread = threading.Thread(target=wrapper)
+        thread.start()
+        thread.join(2)
+        return result[0]
+
+    watchdog = WatchdogTimer(2, -1)
+    watchdog.start(len, ())  # create the pool
+    print(f"Watchdog overhead, {calls} calls")
+    for label, call in (("thread per call", thread_per_call), ("worker pool", lambda: watchdog.start(len, ()))):
+        elapsed = _best_of(lambda: [call() for _ in range(calls)], 3)
+        print(f"  {label:<28} {elapsed / calls * 1e6:8.1f} us/call")
+
+
+def bench_pipeline(frames=20000, groups=12):
+    """BeepPipeline throughput in frames per second."""
+    import random
+    from beeppipeline import BeepPipeline
+
+    recorded = [[random.randint(20, 80) for _ in range(groups * 3)] for _ in range(1000)]
+    stream = (recorded[i % len(recorded)] for i in range(frames))
+    pipeline = BeepPipeline([5, 10, 20, 40, 70], groups)
+    start = time.perf_counter()
+    for _ in pipeline.run(stream):
+        pass
+    elapsed = time.perf_counter() - start
+    print(f"BeepPipeline, {groups} sensor groups, {frames} frames")
+    print(f"  {'per frame (lists)':<28} {frames / elapsed:10.0f} frames/s   {elapsed / frames * 1e6:8.1f} us/frame")
+
+    from sensorframe import make_frames
+    batch = make_frames([recorded[i % len(recorded)] for i in range(frames)])
+    pipeline = BeepPipeline([5, 10, 20, 40, 70], groups)
+    elapsed = _best_of(lambda: pipeline.process_batch(batch), 3)
+    print(f"  {'batch (structured frames)':<28} {frames / elapsed:10.0f} frames/s   {elapsed / frames * 1e6:8.1f} us/frame")
+
+
+def bench_voting(triples=2_000_000):
+    """3-way majority voting throughput: scalar majority_voting vs majority_voting_array."""
+    import numpy as np
+    from teste3 import majority_voting
+    from voting import majority_voting_array
+
+    readings = np.random.randint(0, 6, size=(triples, 3))
+    sample = readings[:100_000].tolist()
+    scalar = _best_of(lambda: [majority_voting(t) for t in sample], 1) / len(sample)
+    vector = _best_of(lambda: majority_voting_array(readings), 3) / triples
+    print(f"Majority voting, {triples} triples")
+    print(f"  {'majority_voting (scalar)':<28} {1 / scalar / 1e6:8.2f} M triples/s")
+    print(f"  {'majority_voting_array':<28} {1 / vector / 1e6:8.2f} M triples/s")
+
+
+def bench_integrity(readings=1_000_000):
+    """Checksum throughput over packed float64 readings (MB/s)."""
+    import random
+    from integrity import checksum_bytes, crc16_ccitt_table, pack_readings
+
+    values = [random.randint(0, 100) for _ in range(readings)]
+    packed = pack_readings(values)
+    mb = len(packed) * packed.itemsize / 1e6
+    print(f"Integrity checks, {readings} readings ({mb:.1f} MB packed)")
+    elapsed = _best_of(lambda: sum(values) % 256, 3)
+    print(f"  {'sum % 256 over the list':<28} {mb / elapsed:10.1f} MB/s")
+    sample = memoryview(packed)[:10_000]
+    elapsed = _best_of(lambda: crc16_ccitt_table(sample), 1) * len(packed) / len(sample)
+    print(f"  {'crc16 (Python table)':<28} {mb / elapsed:10.1f} MB/s")
+    for algorithm in ("crc16", "crc32"):
+        elapsed = _best_of(lambda: checksum_bytes(packed, algorithm), 3)
+        print(f"  {algorithm:<28} {mb / elapsed:10.1f} MB/s")
+
+
+def bench_batch(frames=16, size=16):
+    """count_objects_batch throughput (frames/s) against sequential TMR, per number of workers."""
+    import numpy as np
+    from qcsfr5 import count_objects_batch, count_objects_with_fault_tolerance, tmr_safe_execution
+
+    rng = np.random.default_rng(0)
+    images = [(rng.random((size, size)) < 0.4).astype(np.float64) for _ in range(frames)]
+    lists = [image.tolist() for image in images]
+    print(f"Batch counting, {frames} frames of {size}x{size}, {os.cpu_count()} CPUs")
+    elapsed = _best_of(lambda: [tmr_safe_execution(count_objects_with_fault_tolerance, 10, -1, image, size, size, 0.5)
+                                for image in lists], 1)
+    print(f"  {'sequential TMR':<28} {frames / elapsed:10.1f} frames/s")
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        count_objects_batch(images[:workers], 0.5, workers=workers)  # start the pool
+        elapsed = _best_of(lambda: count_objects_batch(images, 0.5, workers=workers, timeout=10), 1)
+        print(f"  {f'count_objects_batch x{workers}':<28} {frames / elapsed:10.1f} frames/s")
+        workers *= 2
+
+
+def bench_incremental(size=2000, updates=100, patch=8):
+    """IncrementalCounter update with a small dirty rectangle vs a full recount of the frame."""
+    import numpy as np
+    from labeling import IncrementalCounter, count_components
+
+    rng = np.random.default_rng(0)
+    image = rng.random((size, size))
+    counter = IncrementalCounter(0.5)
+    counter.update(image)
+    corners = rng.integers(0, size - patch, size=(updates, 2))
+
+    def run():
+        for y, x in corners.tolist():
+            pixels = rng.random((patch, patch))
+            image[y:y + patch, x:x + patch] = pixels
+            counter.update(pixels, (y, x, y + patch, x + patch))
+
+    incremental = _best_of(run, 1) / updates
+    full = _best_of(lambda: count_components(image > 0.5), 3)
+    print(f"Incremental counting, {size}x{size} frame, {patch}x{patch} dirty rectangles")
+    print(f"  {'full recount':<28} {full * 1e3:10.2f} ms/frame")
+    print(f"  {'IncrementalCounter.update':<28} {incremental * 1e3:10.2f} ms/frame")
+
+
+def bench_tiled(height=4000, width=5000):
+    """Single-process labeling vs count_objects_tiled on a large (20 MP) image."""
+    import numpy as np
+    from labeling import count_components
+    from qcsfr5 import count_objects_tiled
+
+    image = np.random.default_rng(0).random((height, width), dtype=np.float32)
+    print(f"Tiled counting, {height}x{width} float32 image, {os.cpu_count()} CPUs")
+    elapsed = _best_of(lambda: count_components(image > 0.5), 1)
+    print(f"  {'single process':<28} {elapsed:10.2f} s")
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        count_objects_tiled(image[:workers], width, workers, 0.5, workers=workers)  # start the pool
+        elapsed = _best_of(lambda: count_objects_tiled(image, width, height, 0.5, workers=workers), 1)
+        print(f"  {f'count_objects_tiled x{workers}':<28} {elapsed:10.2f} s")
+        workers *= 2
+
+
+def bench_validation(size=1000):
+    """Input validation of count_objects_with_fault_tolerance: per-pixel Python checks vs validate_image."""
+    import numpy as np
+    from qcsfr5 import validate_image
+
+    pixels = np.random.default_rng(0).random((size, size))
+    image = pixels.tolist()
+
+    def per_pixel():
+        return (isinstance(image, list) and all(isinstance(row, list) for row in image)
+                and all(isinstance(val, float) and val >= 0 for row in image for val in row)
+                and not any(len(row) != size for row in image))
+
+    print(f"Image validation, {size}x{size}")
+    for label, func in (("per-pixel checks (list)", per_pixel),
+                        ("validate_image (list)", lambda: validate_image(image, size, size)),
+                        ("validate_image (ndarray)", lambda: validate_image(pixels, size, size))):
+        print(f"  {label:<28} {_best_of(func, 3) * 1e3:10.2f} ms")
+    validated = validate_image(pixels, size, size)[0]
+    elapsed = _best_of(lambda: validate_image(validated, size, size), 3)
+    print(f"  {'already validated (replica)':<28} {elapsed * 1e3:10.4f} ms")
+
+
+def bench_scratch(size=200, frames=5):
+    """Time and allocations per frame (tracemalloc) of count_objects_with_fault_tolerance: new vs reused buffers."""
+    import tracemalloc
+    import numpy as np
+    import qcsfr5
+    from qcsfr5 import count_objects_with_fault_tolerance, prepare_image, BfsScratch
+
+    pixels = np.random.default_rng(0).integers(0, 256, (size, size)).astype(float)
+    prepared = prepare_image(pixels, size, size)
+    threshold = 128.0
+
+    def new_buffers():
+        # what every frame paid before: its own protected copy, parity, CRCs and BFS buffers
+        qcsfr5._bfs_scratch.buffers = BfsScratch()
+        return count_objects_with_fault_tolerance(pixels, size, size, threshold)
+
+    def measure(func):
+        func()  # warm-up: the reused buffers grow to the frame size here
+        tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(frames):
+            func()
+        elapsed = (time.perf_counter() - start) / frames
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak
+
+    print(f"count_objects_with_fault_tolerance, {size}x{size} ({pixels.nbytes / 1024:.0f} KiB of pixels), "
+          f"{frames} frames after a warm-up")
+    for label, func in (("new buffers per frame", new_buffers),
+                        ("reused buffers", lambda: count_objects_with_fault_tolerance(pixels, size, size, threshold)),
+                        ("reused, prepared frame", lambda: count_objects_with_fault_tolerance(prepared, size, size, threshold))):
+        elapsed, peak = measure(func)
+        print(f"  {label:<24} {elapsed * 1e3:10.1f} ms/frame   peak {peak / 1024:10.1f} KiB")
+
+
+BENCHMARKS = {
+    "rs": bench_rs,
+    "watchdog": bench_watchdog,
+    "pipeline": bench_pipeline,
+    "voting": bench_voting,
+    "integrity": bench_integrity,
+    "batch": bench_batch,
+    "incremental": bench_incremental,
+    "tiled": bench_tiled,
+    "validation": bench_validation,
+    "scratch": bench_scratch,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Performance benchmarks")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name]()
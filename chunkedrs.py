@@ -0,0 +1,261 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+from reedsolo import RSCodec, ReedSolomonError
+
+# Chunked Reed-Solomon over GF(2^8), byte-compatible with reedsolo's RSCodec
+# (primitive polynomial 0x11d, generator 2, fcr 0). A payload is cut into
+# chunks of 'chunk_size' bytes and every chunk becomes one codeword
+# (chunk + nsym parity bytes). Instead of running the LFSR codeword by codeword,
+# all codewords of a group are advanced together one byte position at a time
+# with NumPy table lookups; groups are spread over a thread or process pool.
+
+PRIM = 0x11d
+
+
+def _gf_tables():
+    exp = np.zeros(512, dtype=np.int64)
+    log = np.zeros(256, dtype=np.int64)
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= PRIM
+    exp[255:510] = exp[:255]
+    # full 256 x 256 multiplication table
+    mul = np.zeros((256, 256), dtype=np.uint8)
+    mul[1:, 1:] = exp[log[1:, None] + log[None, 1:]]
+    return exp, mul
+
+
+GF_EXP, GF_MUL = _gf_tables()
+
+
+def generator_poly(nsym):
+    """Generator polynomial (highest degree first) of an RS code with nsym parity bytes."""
+    gen = [1]
+    for i in range(nsym):
+        root = int(GF_EXP[i])
+        gen = [a ^ int(GF_MUL[b, root]) for a, b in zip(gen + [0], [0] + gen)]
+    return gen
+
+
+def _as_codewords(data, chunk_size, width, out=None):
+    """
+    Splits 'data' into an (n, width) uint8 matrix, one chunk per row. The last,
+    shorter chunk is left-padded with zeros, which does not change its RS code.
+    The matrix is written into 'out' (n rows at least) if it is given.
+    """
+    data = np.frombuffer(data, dtype=np.uint8)
+    count = -(-len(data) // chunk_size)
+    full = len(data) // chunk_size
+    if out is None:
+        rows = np.zeros((count, width), dtype=np.uint8)
+    else:
+        rows = out[:count]
+        rows[:, :width - chunk_size] = 0
+    rows[:full, width - chunk_size:] = data[:full * chunk_size].reshape(full, chunk_size)
+    if count > full:
+        tail = data[full * chunk_size:]
+        rows[full, :width - len(tail)] = 0
+        rows[full, width - len(tail):] = tail
+    return rows
+
+
+class ParityWorkspace:
+    """
+    Arrays used by encode_parity, kept by a caller that encodes payloads of about the
+    same size again and again, so that encoding allocates nothing (they grow with the
+    largest payload, never shrink).
+    """
+
+    def __init__(self):
+        self.buffer = np.empty(0, dtype=np.uint8)
+
+    def arrays(self, count, nsym, chunk_size):
+        """Returns (messages, register, feedback, terms) for 'count' codewords."""
+        sizes = (count * chunk_size, count * (nsym + chunk_size), count, count * nsym)
+        if sum(sizes) > self.buffer.size:
+            self.buffer = np.empty(sum(sizes), dtype=np.uint8)
+        arrays, start = [], 0
+        for size in sizes:
+            arrays.append(self.buffer[start:start + size])
+            start += size
+        messages, register, feedback, terms = arrays
+        return (messages.reshape(count, chunk_size), register.reshape(count, nsym + chunk_size),
+                feedback, terms.reshape(count, nsym))
+
+
+def encode_parity(data, nsym, chunk_size, out=None, work=None):
+    """
+    Returns an (n, nsym) uint8 array with the parity of every chunk of 'data',
+    written into 'out' if it is given; 'work' is a ParityWorkspace to reuse.
+    """
+    gen = generator_poly(nsym)
+    feedback_table = GF_MUL[:, gen[1:]]  # feedback byte -> terms xored into the register
+    count = -(-memoryview(data).nbytes // chunk_size)
+    messages, register, feedback, terms = (work or ParityWorkspace()).arrays(count, nsym, chunk_size)
+    _as_codewords(data, chunk_size, chunk_size, out=messages)
+    register[:] = 0
+    # the register slides along a wider buffer so the per-byte shift is a view, not a copy
+    for i in range(chunk_size):
+        np.bitwise_xor(messages[:, i], register[:, i], out=feedback)
+        np.take(feedback_table, feedback, axis=0, out=terms, mode='clip')  # feedback is a byte: never clipped
+        register[:, i + 1:i + 1 + nsym] ^= terms
+    if out is None:
+        return register[:, chunk_size:chunk_size + nsym].copy()
+    out[:] = register[:, chunk_size:chunk_size + nsym]
+    return out
+
+
+def syndromes(codewords, nsym, chunk_size):
+    """Returns an (n, nsym) uint8 array with the syndromes of every codeword (all zero = no error)."""
+    width = chunk_size + nsym
+    words = _as_codewords(codewords, width, width)
+    roots = GF_EXP[:nsym].astype(np.uint8)
+    result = np.zeros((len(words), nsym), dtype=np.uint8)
+    for i in range(width):
+        result = GF_MUL[result, roots] ^ words[:, i, None]
+    return result
+
+
+def _parity_task(data, nsym, chunk_size):
+    return encode_parity(data, nsym, chunk_size)
+
+
+def _syndrome_task(data, nsym, chunk_size):
+    return syndromes(data, nsym, chunk_size).any(axis=1)
+
+
+# Pools are created on first use and reused by every codec
+_pools = {}
+
+
+def get_pool(kind, workers=None):
+    workers = workers or os.cpu_count() or 1
+    key = (kind, workers)
+    if key not in _pools:
+        if kind == "thread":
+            _pools[key] = ThreadPoolExecutor(max_workers=workers)
+        elif kind == "process":
+            _pools[key] = ProcessPoolExecutor(max_workers=workers)
+        else:
+            raise ValueError(f"Unknown pool '{kind}', expected 'thread' or 'process'")
+    return _pools[key]
+
+
+class ChunkedRSCodec:
+    '''
+    Reed-Solomon codec for large payloads, chunked and parallel.
+
+    Input Parameters:
+        nsym = Parity bytes per codeword (corrects up to nsym // 2 byte errors per chunk)
+        chunk_size = Message bytes per codeword (at most 255 - nsym)
+        workers = Number of pool workers (default: CPU count)
+        pool = "thread", "process" or None to run in the calling thread
+        group_size = Codewords per pool task
+    '''
+
+    def __init__(self, nsym=10, chunk_size=None, workers=None, pool="thread", group_size=2048):
+        if not 0 < nsym < 255:
+            raise ValueError("nsym must be between 1 and 254")
+        self.nsym = nsym
+        self.chunk_size = chunk_size or 255 - nsym
+        if not 0 < self.chunk_size <= 255 - nsym:
+            raise ValueError(f"chunk_size must be between 1 and {255 - nsym} for nsym={nsym}")
+        self.workers = workers
+        self.pool = pool
+        self.group_size = group_size
+        self._rs = RSCodec(nsym, nsize=self.chunk_size + nsym)
+
+    def encoded_size(self, size):
+        """Size in bytes of the encoding of a 'size'-byte payload."""
+        return size + -(-size // self.chunk_size) * self.nsym
+
+    def _map(self, task, data, step):
+        view = memoryview(data).cast('B')
+        groups = [view[i:i + step] for i in range(0, len(view), step)]
+        if self.pool is None or len(groups) < 2:
+            return [task(group, self.nsym, self.chunk_size) for group in groups]
+        if self.pool == "process":
+            groups = [bytes(group) for group in groups]  # memoryviews cannot be pickled
+        executor = get_pool(self.pool, self.workers)
+        return list(executor.map(task, groups, [self.nsym] * len(groups), [self.chunk_size] * len(groups)))
+
+    def parity(self, data, out=None, work=None):
+        """
+        Returns an (n, nsym) uint8 array with the parity of every chunk of 'data'. With a
+        preallocated 'out' or a ParityWorkspace 'work', the payload is encoded in the
+        calling thread into reused arrays instead of being spread over the pool.
+        """
+        if out is not None or work is not None:
+            return encode_parity(data, self.nsym, self.chunk_size, out=out, work=work)
+        parts = self._map(_parity_task, data, self.group_size * self.chunk_size)
+        if not parts:
+            return np.zeros((0, self.nsym), dtype=np.uint8)
+        return np.concatenate(parts)
+
+    def encode(self, data, out=None):
+        """
+        Encodes 'data' into 'out' (preallocated bytearray of encoded_size bytes, created
+        if None): every chunk followed by its parity, the same layout as RSCodec.encode.
+        """
+        view = memoryview(data).cast('B')
+        size = len(view)
+        if out is None:
+            out = bytearray(self.encoded_size(size))
+        target = np.frombuffer(out, dtype=np.uint8)
+        parity = self.parity(view)
+        source = np.frombuffer(view, dtype=np.uint8)
+        full = size // self.chunk_size
+        width = self.chunk_size + self.nsym
+        rows = target[:full * width].reshape(full, width)
+        rows[:, :self.chunk_size] = source[:full * self.chunk_size].reshape(full, self.chunk_size)
+        rows[:, self.chunk_size:] = parity[:full]
+        tail = size - full * self.chunk_size
+        if tail:
+            start = full * width
+            target[start:start + tail] = source[full * self.chunk_size:]
+            target[start + tail:start + tail + self.nsym] = parity[full]
+        return out
+
+    def decode(self, encoded, out=None):
+        """
+        Decodes 'encoded' into 'out' (preallocated bytearray, created if None).
+        Only codewords with a non-zero syndrome go through the full RS decoder.
+        Returns (out, corrected_chunk_indices). Raises ReedSolomonError if a chunk
+        cannot be corrected.
+        """
+        view = memoryview(encoded).cast('B')
+        width = self.chunk_size + self.nsym
+        count = -(-len(view) // width)
+        size = len(view) - count * self.nsym
+        if out is None:
+            out = bytearray(size)
+        target = np.frombuffer(out, dtype=np.uint8)
+        source = np.frombuffer(view, dtype=np.uint8)
+        full = len(view) // width
+        target[:full * self.chunk_size].reshape(full, self.chunk_size)[:] = \
+            source[:full * width].reshape(full, width)[:, :self.chunk_size]
+        if count > full:
+            target[full * self.chunk_size:] = source[full * width:len(view) - self.nsym]
+        damaged = np.concatenate(self._map(_syndrome_task, view, self.group_size * width) or
+                                 [np.zeros(0, dtype=bool)])
+        corrected = np.flatnonzero(damaged).tolist()
+        for chunk in corrected:
+            codeword = bytearray(view[chunk * width:(chunk + 1) * width])
+            try:
+                message = self._rs.decode(codeword)[0]
+            except ReedSolomonError:
+                logging.error(f"Soft error detected in chunk {chunk}, unable to correct.")
+                raise
+            target[chunk * self.chunk_size:chunk * self.chunk_size + len(message)] = np.frombuffer(message, dtype=np.uint8)
+        return out, corrected
+
+    def decode_chunk(self, codeword):
+        """Decodes a single codeword (message + parity). Returns (message, corrected)."""
+        message, _, errata = self._rs.decode(bytearray(codeword))
+        return message, bool(errata)
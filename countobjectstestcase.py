@@ -0,0 +1,412 @@
+import unittest
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import qcsfr5
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from qcsfr5 import (
+    count_objects_without_fault_tolerance, count_objects_numpy,
+    count_objects_with_fault_tolerance, encode_rs, compare_rs,
+    WatchdogPool, WatchdogTimer, tmr_safe_execution, nmr_safe_execution,
+    StreamingVoter, CALL_OK, CALL_TIMEOUT, count_objects_batch, count_objects_tiled, count_objects_stream, count_objects_cached, get_watchdog_pool,
+    validate_image, prepare_image, INVALID_FORMAT, EMPTY_IMAGE, INVALID_VALUES, DIMENSION_MISMATCH,
+    get_bfs_scratch, last_valid_values, lease_replica_pool, replica_pool_stats
+)
+from labeling import label_image, IncrementalCounter, StreamingCounter
+from protectedbuffer import ProtectedBuffer
+from chunkedrs import ChunkedRSCodec, ParityWorkspace
+from reedsolo import RSCodec
+from resultcache import ResultCache
+from integrity import checksum_bytes
+
+def _crash_once(marker, image, width, height, threshold, stream=0):
+    """Kills its worker process the first time it runs (the marker file records it)."""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return count_objects_with_fault_tolerance(image, width, height, threshold, stream)
+
+
+def _hang(*args):
+    time.sleep(60)
+
+
+def _total(values, offset=0):
+    return float(np.sum(values)) + offset
+
+
+class TestCountObjectsMethods(unittest.TestCase):
+
+    def random_image(self, height, width, density):
+        return [[1.0 if random.random() < density else 0.0 for _ in range(width)] for _ in range(height)]
+
+    def test_numpy_backend_matches_python(self):
+        cases = [
+            ([[0.2, 0.2], [0.2, 0.2]], 2, 2, 0.1),
+            ([[0.2, 0.2], [0.2, 0.2]], 2, 2, 0.3),
+            ([[0.2]], 1, 1, 0.1),
+            ([[1.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 1.0]], 3, 3, 0.1),
+            ([[1.0, 0.0, 1.0], [1.0, 0.0, 1.0], [1.0, 1.0, 1.0]], 3, 3, 0.1),
+            ([], 0, 0, 0.1),
+        ]
+        for _ in range(30):
+            height, width = random.randint(1, 25), random.randint(1, 25)
+            cases.append((self.random_image(height, width, random.random()), width, height, 0.5))
+        for image, width, height, threshold in cases:
+            expected = count_objects_without_fault_tolerance(image, width, height, threshold)
+            self.assertEqual(count_objects_without_fault_tolerance(image, width, height, threshold, backend="numpy"), expected)
+            self.assertEqual(count_objects_numpy(np.array(image, dtype=np.float64), width, height, threshold), expected)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            count_objects_without_fault_tolerance([[0.2]], 1, 1, 0.1, backend="gpu")
+
+    def test_label_image(self):
+        mask = np.array([[1, 1, 0], [0, 0, 0], [1, 0, 1]], dtype=bool)
+        labels, count = label_image(mask)
+        self.assertEqual(count, 3)
+        self.assertEqual(labels.tolist(), [[1, 1, 0], [0, 0, 0], [2, 0, 3]])
+
+    def test_fault_tolerant_matches_plain(self):
+        for _ in range(10):
+            height, width = random.randint(1, 12), random.randint(1, 12)
+            image = self.random_image(height, width, 0.5)
+            self.assertEqual(count_objects_with_fault_tolerance(image, width, height, 0.5),
+                             count_objects_without_fault_tolerance(image, width, height, 0.5))
+
+    def test_protected_buffer_repairs_block_on_read(self):
+        image = [[float(i * 10 + j) for j in range(10)] for i in range(10)]
+        buffer = ProtectedBuffer(image)
+        self.assertEqual(buffer.get(3, 4), 34.0)
+        buffer.data[5, 5] = 999.0  # simulated soft error
+        buffer.invalidate()
+        self.assertEqual(buffer.get(5, 5), 55.0)
+        self.assertEqual(buffer.repairs, 1)
+        checks = buffer.checks
+        buffer.verify_all()
+        buffer.verify_all()
+        self.assertEqual(buffer.checks, checks + buffer.blocks - 1)
+        buffer[2, 2] = 7.0
+        self.assertEqual(buffer.get(2, 2), 7.0)
+        self.assertEqual(ProtectedBuffer(3, dtype=np.int64).value, 3)
+
+        # load() protects new data in the same storage, growing it only for larger data
+        storage = buffer.data
+        frame = np.arange(40.0).reshape(4, 10)
+        self.assertIs(buffer.load(frame), buffer.data)
+        self.assertTrue(np.shares_memory(buffer.data, storage))
+        buffer.data[1, 1] = -1.0  # simulated soft error
+        buffer.invalidate()
+        self.assertEqual(buffer.verify_all().tolist(), frame.tolist())
+        buffer.load(np.arange(300.0))
+        self.assertEqual((buffer.shape, buffer.read(299)), ((300,), 299.0))
+
+    def test_binary_rs_round_trip(self):
+        values = [None, True, 7, -2 ** 70, 0.25, "image", [[0.5, 1.0], [0.0, 2.5]], [[]],
+                  [[1, 2], [3, 4]], {(0, 1), (2, 3)}, [(1, 2)]]
+        for value in values:
+            self.assertEqual(compare_rs(value, encode_rs(value), "value"), value)
+        matrix = np.arange(12, dtype=np.float64).reshape(3, 4)
+        self.assertTrue(np.array_equal(compare_rs(matrix, encode_rs(matrix), "matrix"), matrix))
+        for value in (np.float64(1.5), np.float32(0.25), np.int64(-3)):
+            with self.assertNoLogs(level="ERROR"):
+                self.assertEqual(compare_rs(value, encode_rs(value), "scalar"), value)
+        for empty in (np.zeros(0), np.zeros((0, 3))):
+            self.assertEqual(compare_rs(empty, encode_rs(empty), "empty").shape, empty.shape)
+        self.assertLess(len(encode_rs([[0.123456789] * 50] * 50)), len(str([[0.123456789] * 50] * 50)))
+        encoded = encode_rs([[0.5, 1.0], [0.0, 2.5]])
+        encoded[12] ^= 0xFF  # simulated soft error
+        self.assertEqual(compare_rs(None, encoded, "matrix"), [[0.5, 1.0], [0.0, 2.5]])
+
+    def test_chunked_rs_matches_rscodec(self):
+        data = bytearray(random.getrandbits(8) for _ in range(3000))
+        for pool in (None, "thread", "process"):
+            codec = ChunkedRSCodec(10, workers=2, pool=pool, group_size=4)
+            encoded = codec.encode(data)
+            self.assertEqual(encoded, RSCodec(10).encode(data))
+            work, out = ParityWorkspace(), np.empty((13, 10), dtype=np.uint8)
+            self.assertIs(codec.parity(data, out=out, work=work), out)
+            self.assertTrue(np.array_equal(out, codec.parity(data)))
+            encoded[7] ^= 0x55
+            encoded[1000] ^= 0x0F
+            decoded, corrected = codec.decode(encoded)
+            self.assertEqual(decoded, data)
+            self.assertEqual(corrected, [0, 3])
+
+    def test_watchdog_pool(self):
+        pool = WatchdogPool(workers=2, max_pending=2)
+        watchdog = WatchdogTimer(0.05, -1, pool=pool)
+        self.assertEqual(watchdog.start(lambda a, b: a + b, 2, 3), 5)
+        self.assertEqual(watchdog.start(lambda: 1 / 0), -1)
+        self.assertEqual(watchdog.start(time.sleep, 0.3), -1)
+        self.assertEqual(pool.stats()["stuck"], 1)
+        self.assertEqual(watchdog.start(time.sleep, 0.3), -1)
+        self.assertEqual(watchdog.start(lambda: 7), -1)  # both slots held by stuck calls
+        self.assertEqual(pool.rejected, 1)
+        time.sleep(0.4)
+        self.assertEqual(pool.stats()["stuck"], 0)
+        self.assertEqual(pool.abandoned, 2)
+        self.assertEqual(watchdog.start(lambda: 7), 7)
+
+    def test_tmr_process_mode(self):
+        image = [[1.0, 0.0, 1.0], [1.0, 0.0, 0.0], [0.0, 1.0, 1.0]]
+        for mode in ("sequential", "process"):
+            self.assertEqual(tmr_safe_execution(count_objects_with_fault_tolerance, 5, -1, image, 3, 3, 0.5, mode=mode), 3)
+            self.assertEqual(tmr_safe_execution(count_objects_with_fault_tolerance, 5, -1, [[0.2, "X"]], 2, 1, 0.1, mode=mode), -1)
+            # rejected by the counter, even though NumPy would convert them
+            for invalid in ([[1, 0], [0, 1]], [["0.5", "1.0"]]):
+                self.assertEqual(tmr_safe_execution(count_objects_with_fault_tolerance, 5, -1, invalid, 2, len(invalid), 0.5,
+                                                    mode=mode), -1)
+        with self.assertRaises(ValueError):
+            tmr_safe_execution(count_objects_with_fault_tolerance, 5, -1, image, 3, 3, 0.5, mode="threads")
+
+    def test_process_mode_any_function(self):
+        # not an image counter: the arguments are passed through as they are
+        self.assertEqual(tmr_safe_execution(_total, 5, -1, np.arange(6).reshape(2, 3), 1, mode="process"), 16.0)
+        self.assertEqual(tmr_safe_execution(_total, 5, -1, [1, 2, 3], mode="process"), 6.0)
+
+    def test_process_mode_stuck_replicas(self):
+        before = dict(replica_pool_stats)
+        start = time.perf_counter()
+        with self.assertLogs(level="ERROR"):
+            self.assertEqual(tmr_safe_execution(_hang, 0.3, -1, np.ones((2, 2)), mode="process"), -1)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(replica_pool_stats["abandoned"] - before["abandoned"], 3)
+        self.assertEqual(replica_pool_stats["stuck"], before["stuck"])  # their workers were terminated
+        self.assertGreaterEqual(replica_pool_stats["terminated"] - before["terminated"], 3)
+        image = [[1.0, 0.0, 1.0], [1.0, 0.0, 0.0], [0.0, 1.0, 1.0]]
+        self.assertEqual(tmr_safe_execution(count_objects_with_fault_tolerance, 5, -1, image, 3, 3, 0.5, mode="process"), 3)
+
+    def test_streaming_voter(self):
+        voter = StreamingVoter(replicas=5, fallback_value=-1)
+        self.assertEqual(voter.quorum, 3)
+        self.assertFalse(voter.add(0, CALL_OK, 4))
+        self.assertFalse(voter.add(1, CALL_OK, 5))
+        self.assertFalse(voter.add(2, CALL_TIMEOUT))
+        self.assertFalse(voter.add(3, CALL_OK, 4))
+        self.assertFalse(voter.add(4, CALL_OK, -1))
+        self.assertEqual(voter.result(), (4, [0, 3], [1], [4], [2], []))
+        voter = StreamingVoter(replicas=3, fallback_value=-1)
+        self.assertFalse(voter.add(0, CALL_OK, 2))
+        self.assertTrue(voter.add(1, CALL_OK, 2))
+        self.assertEqual(voter.result(), (2, [0, 1], [], [], [], [2]))
+
+    def test_nmr_early_exit(self):
+        calls = []
+
+        def replica(value):
+            calls.append(value)
+            return value
+
+        result = nmr_safe_execution(replica, 1, -1, 6, replicas=5, quorum=2)
+        self.assertEqual((result.value, result.agreed, result.skipped), (6, [0, 1], [2, 3, 4]))
+        self.assertEqual(len(calls), 2)
+        result = nmr_safe_execution(count_objects_with_fault_tolerance, 5, -1, [[1.0, 0.0, 1.0]], 3, 1, 0.5, mode="process")
+        self.assertEqual((result.value, len(result.agreed)), (2, 2))
+
+    def test_count_objects_batch(self):
+        get_watchdog_pool()  # the forked workers must not inherit this pool's threads
+        frames = [self.random_image(random.randint(1, 15), random.randint(1, 15), 0.4) for _ in range(12)]
+        frames.append(np.array([[1.0, 0.0, 1.0]]))
+        frames.append([[0.2, "X"], [0.2, 0.2]])
+        frames.append([])
+        frames.append([[1, 0], [0, 1]])  # int pixels: rejected by the counter, as in tmr_safe_execution
+        frames.append([["0.5", "1.0"]])
+        expected = [count_objects_numpy(f, len(f[0]), len(f), 0.5) for f in frames[:13]] + [-1, -1, -1, -1]
+        self.assertEqual(count_objects_batch(frames, 0.5, workers=2), expected)
+        self.assertEqual(count_objects_batch([], 0.5), [])
+
+    def test_replica_pools_per_worker_count(self):
+        frames = [self.random_image(6, 6, 0.5) for _ in range(4)]
+        expected = [count_objects_numpy(f, 6, 6, 0.5) for f in frames]
+        with lease_replica_pool(2) as pool:
+            busy = pool.submit(time.sleep, 0.2)
+            self.assertEqual(count_objects_batch(frames, 0.5, workers=3), expected)  # another pool
+            with lease_replica_pool(3) as other:
+                self.assertIsNot(other, pool)
+            self.assertIsNone(busy.result())  # not cancelled by the larger pool
+            with lease_replica_pool(2) as same:
+                self.assertIs(same, pool)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            # a worker dies: the frames lost with its pool are counted again on a new pool
+            func = partial(_crash_once, os.path.join(tmp, "crashed"))
+            with self.assertLogs(level="ERROR"):
+                self.assertEqual(count_objects_batch(frames, 0.5, workers=2, func=func), expected)
+
+    def test_stream_state(self):
+        image = [[1.0, 0.0, 1.0], [1.0, 0.0, 0.0], [0.0, 1.0, 1.0]]
+        self.assertEqual(count_objects_with_fault_tolerance(image, 3, 3, 0.5, stream="cam-a"), 3)
+        self.assertEqual(count_objects_cached(image, 3, 3, 0.5, cache=ResultCache(), stream="cam-b"), 3)
+        self.assertEqual(count_objects_batch([image], 0.5, workers=1, stream="cam-c"), [3])
+        self.assertEqual(last_valid_values.recall(("cam-a", "object_count")), 2)  # before the last increment
+        self.assertEqual(last_valid_values.recall(("cam-b", "object_count")), 2)
+
+    def test_incremental_counter(self):
+        rng = np.random.default_rng(5)
+        image = rng.random((40, 50))
+        counter = IncrementalCounter(0.5, debug=True)  # debug: every update is checked against a full recount
+        self.assertEqual(counter.update(image), count_objects_numpy(image, 50, 40, 0.5))
+        for step in range(60):
+            top, left = rng.integers(0, 40), rng.integers(0, 50)
+            bottom, right = rng.integers(top, 41), rng.integers(left, 51)
+            patch = rng.random((bottom - top, right - left))
+            image[top:bottom, left:right] = patch
+            if step % 2:
+                count = counter.update(patch, (top, left, bottom, right))
+            else:
+                count = counter.update(image)
+            self.assertEqual(count, count_objects_numpy(image, 50, 40, 0.5))
+        counter.update(image)
+        self.assertEqual(counter.relabeled, 0)  # unchanged frame: nothing relabeled
+        with self.assertRaises(ValueError):
+            counter.update(image, (0, 0, 41, 50))
+
+    def test_tiled_counting(self):
+        rng = np.random.default_rng(8)
+        for height, width, density in ((1, 30, 0.5), (37, 23, 0.4), (64, 64, 0.6), (50, 3, 0.7)):
+            image = (rng.random((height, width)) < density).astype(np.float64)
+            expected = count_objects_numpy(image, width, height, 0.5)
+            for strip_rows in (1, 2, 5, None):
+                self.assertEqual(count_objects_tiled(image, width, height, 0.5, workers=2, strip_rows=strip_rows), expected)
+        spiral = [[1.0] * 9, [0.0] * 8 + [1.0], [1.0] * 9, [1.0] + [0.0] * 8, [1.0] * 9]  # one object over every strip
+        self.assertEqual(count_objects_tiled(spiral, 9, 5, 0.5, strip_rows=1), 1)
+
+    def test_streaming_counter(self):
+        for _ in range(30):
+            height, width = random.randint(1, 25), random.randint(1, 25)
+            image = self.random_image(height, width, random.random())
+            expected = count_objects_numpy(image, width, height, 0.5)
+            self.assertEqual(count_objects_stream(iter(image), 0.5), expected)
+            counter = StreamingCounter(0.5)
+            for row in image:
+                counter.push(row)
+                self.assertLessEqual(len(counter._ids), width)  # state bounded by one row
+            self.assertEqual(counter.finish(), expected)
+        self.assertEqual(count_objects_stream([[1.0, 0.0], [1.0]], 0.5), -1)
+        self.assertEqual(count_objects_stream([], 0.5), 0)
+
+    def test_result_cache(self):
+        cache = ResultCache(max_bytes=1000)
+        image = [[1.0, 0.0, 1.0], [1.0, 0.0, 0.0], [0.0, 1.0, 1.0]]
+        for fault_tolerant in (True, False):
+            self.assertEqual(count_objects_cached(image, 3, 3, 0.5, fault_tolerant, cache=cache), 3)
+            self.assertEqual(count_objects_cached(np.array(image), 3, 3, 0.5, fault_tolerant, cache=cache), 3)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (2, 2, 2))
+        self.assertEqual(count_objects_cached(image, 3, 3, 0.9, cache=cache), 3)  # another threshold: miss
+        self.assertEqual(cache.misses, 3)
+
+        crc = checksum_bytes(np.array(image).tobytes(), "crc32")
+        self.assertEqual(count_objects_cached(image, 3, 3, 0.5, checksum=crc, cache=cache), 3)
+        self.assertEqual(count_objects_cached(image, 3, 3, 0.5, checksum=crc ^ 1, cache=cache), -1)
+        self.assertEqual(cache.rejected, 1)
+        negative = [[1.0, -1.0]]
+        self.assertEqual(count_objects_cached(negative, 2, 1, 0.5, cache=cache), -1)
+        self.assertEqual(count_objects_cached(negative, 2, 1, 0.5, cache=cache), -1)
+        for threshold in ("x", None, 1):
+            with self.assertLogs(level="ERROR"):
+                self.assertEqual(count_objects_cached(image, 3, 3, threshold, cache=cache), -1)
+        self.assertEqual(cache.hits, 3)  # failed frames are never cached
+
+        for i in range(10):  # a 1000-byte cache holds only a few entries
+            count_objects_cached([[float(i)]], 1, 1, 0.5, False, cache=cache)
+        self.assertLessEqual(cache.bytes, 1000)
+        self.assertGreater(cache.evictions, 0)
+
+    def test_fast_validation(self):
+        cases = [
+            ("not an image", 1, 1, INVALID_FORMAT),
+            ([[0.5], (0.5,)], 1, 2, INVALID_FORMAT),
+            (np.array([1.0, 2.0]), 2, 1, INVALID_FORMAT),
+            (np.array([[1, 2]]), 2, 1, INVALID_FORMAT),  # integer array
+            ([], 0, 0, EMPTY_IMAGE),
+            ([[0.5, 1]], 2, 1, INVALID_VALUES),  # int pixel, rejected as before
+            ([[0.5, -0.5]], 2, 1, INVALID_VALUES),
+            ([[0.5, float("nan")]], 2, 1, INVALID_VALUES),
+            ([[0.5, 0.5], [-1.0]], 2, 2, INVALID_VALUES),
+            (np.array([[0.5, -0.5]]), 2, 1, INVALID_VALUES),
+            ([[0.5, 0.5], [0.5]], 2, 2, DIMENSION_MISMATCH),
+            ([[0.5, 0.5]], 3, 1, DIMENSION_MISMATCH),
+            (np.zeros((2, 3)), 2, 3, DIMENSION_MISMATCH),
+        ]
+        for image, width, height, message in cases:
+            self.assertEqual(validate_image(image, width, height), (None, message))
+            with self.assertLogs(level="ERROR") as logs:
+                self.assertEqual(count_objects_with_fault_tolerance(image, width, height, 0.5), -1)
+            self.assertIn(message, logs.output[0])
+
+        image = [[1.0, 0.0, 1.0], [1.0, 0.0, 0.0], [0.0, 1.0, 1.0]]
+        pixels = prepare_image(image, 3, 3)
+        self.assertIsInstance(pixels, np.ndarray)
+        self.assertFalse(pixels.flags.writeable)
+        self.assertIs(validate_image(pixels, 3, 3)[0], pixels)  # O(1) for later replicas
+        self.assertIs(prepare_image([[0.2, "X"]], 2, 1)[0][1], "X")  # invalid images are passed through
+        self.assertEqual(tmr_safe_execution(count_objects_with_fault_tolerance, 5, -1, pixels, 3, 3, 0.5), 3)
+        self.assertEqual(count_objects_with_fault_tolerance(np.array(image), 3, 3, 0.5), 3)
+        # a vote on the caller's array validates and freezes it once, not once per replica
+        with mock.patch("qcsfr5._remember_valid", wraps=qcsfr5._remember_valid) as remember:
+            self.assertEqual(tmr_safe_execution(count_objects_with_fault_tolerance, 5, -1, np.array(image), 3, 3, 0.5), 3)
+            self.assertEqual(nmr_safe_execution(count_objects_with_fault_tolerance, 5, -1, np.array(image), 3, 3, 0.5,
+                                                replicas=5).value, 3)
+        self.assertEqual(remember.call_count, 2)
+
+        # changing the caller's array after validation must not reach the validated frame
+        a = np.array([[1.0, 0.0], [0.0, 1.0]])
+        v = prepare_image(a, 2, 2)
+        a[0, 0], a[1, 1] = -5.0, float("nan")
+        self.assertEqual(v.tolist(), [[1.0, 0.0], [0.0, 1.0]])
+        self.assertFalse(np.shares_memory(a, v))
+        self.assertEqual(count_objects_with_fault_tolerance(v, 2, 2, 0.5), 2)
+        with self.assertLogs(level="ERROR"):
+            self.assertEqual(count_objects_with_fault_tolerance(a, 2, 2, 0.5), -1)
+        with self.assertRaises(ValueError):
+            v.flags.writeable = True
+
+    def test_bfs_scratch_reuse(self):
+        rng = np.random.default_rng(3)
+        scratch = get_bfs_scratch()
+        count_objects_with_fault_tolerance(np.ones((30, 30)), 30, 30, 0.5)
+        pending, storage = scratch.pending, scratch.image_rs.data
+        for height, width in [(30, 30), (1, 25), (25, 1), (7, 13), (20, 30)]:
+            image = rng.integers(0, 3, (height, width)).astype(float)
+            expected = count_objects_numpy(image, width, height, 1)
+            self.assertEqual(count_objects_with_fault_tolerance(image.tolist(), width, height, 1.0), expected)
+            self.assertEqual(count_objects_with_fault_tolerance(image, width, height, 1.0), expected)
+            self.assertEqual(scratch.image_rs.data.tolist(), image.tolist())
+            self.assertTrue(np.shares_memory(scratch.image_rs.data, storage))  # same protected storage
+        self.assertIs(scratch.pending, pending)  # smaller frames reuse the buffers
+        self.assertIs(get_bfs_scratch(), scratch)
+        self.assertEqual(count_objects_with_fault_tolerance(np.ones((40, 40)), 40, 40, 0.5), 1)  # grows once
+        self.assertGreaterEqual(len(scratch.pending), 1600)
+
+        # once the buffers have grown, a frame allocates a small fraction of its own size
+        image = rng.random((100, 100))
+        expected = count_objects_numpy(image, 100, 100, 0.5)
+        self.assertEqual(count_objects_with_fault_tolerance(image, 100, 100, 0.5), expected)
+        tracemalloc.start()
+        try:
+            self.assertEqual(count_objects_with_fault_tolerance(image, 100, 100, 0.5), expected)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, image.nbytes // 4)
+
+    def test_concurrent_fault_tolerant_counts(self):
+        images = [self.random_image(random.randint(5, 20), random.randint(5, 20), 0.5) for _ in range(8)]
+        expected = [count_objects_numpy(image, len(image[0]), len(image), 0.5) for image in images]
+
+        def count(i):
+            image = images[i % len(images)]
+            return count_objects_with_fault_tolerance(image, len(image[0]), len(image), 0.5)
+
+        with ThreadPoolExecutor(8) as pool:
+            got = list(pool.map(count, range(240)))
+        self.assertEqual(got, [expected[i % len(images)] for i in range(240)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,28 @@
 import unittest
+from unittest import mock
+import asyncio
+import os
+import time
 import random
+import tempfile
+import statistics
 from teste3 import (
-    KalmanFilter, checksum, is_valid_data, safe_reading,
+    KalmanFilter, KalmanFilterBank, checksum, is_valid_data, safe_reading,
     get_distance_with_backup, majority_voting,
-    get_beep_level_with_fault_tolerance
+    get_beep_level_with_fault_tolerance, sensor_state
 )
+from beeppipeline import BeepPipeline, MultiStreamPipeline, vote3
+from voting import majority_voting_array
+from beeplevels import BeepLevelTable, level_table
+from outliers import reject_outliers
+from sensorframe import make_frames, frames_from_buffer, frame_dtype
+from statestore import StateStore
+from beepserver import BeepServer, BeepClient
+from ingestion import SensorIngestor, SimulatedSensor
+from replay import write_log, replay, read_levels, reverse_drive_batches
+from integrity import Checksum, checksum_bytes, crc16_ccitt, crc16_ccitt_table
+import numpy as np
+import teste2majorityvoting
 
 class TestFaultToleranceMethods(unittest.TestCase):
     
@@ -14,12 +32,37 @@ class TestFaultToleranceMethods(unittest.TestCase):
         smoothed_values = [kalman.update(meas) for meas in noisy_readings]
         self.assertTrue(all(abs(smoothed_values[i] - smoothed_values[i-1]) < 2 for i in range(1, len(smoothed_values))))
     
+    def test_kalman_filter_bank_matches_scalar(self):
+        readings = [[random.uniform(0, 100) for _ in range(4)] for _ in range(1500)]
+        filters = [KalmanFilter() for _ in range(4)]
+        expected = [[f.update(r) for f, r in zip(filters, row)] for row in readings]
+        bank = KalmanFilterBank(4)
+        for row, exp in zip(readings[:20], expected[:20]):
+            for a, b in zip(bank.update(row), exp):
+                self.assertAlmostEqual(a, b, places=9)
+        series = bank.filter_series(readings[20:])
+        for row, exp in zip(series, expected[20:]):
+            for a, b in zip(row, exp):
+                self.assertAlmostEqual(a, b, places=9)
+
     def test_checksum_verification(self):
         data = [10, 20, 30, 40]
         valid_checksum = checksum(data)
         self.assertTrue(is_valid_data(data + [valid_checksum]))
         self.assertFalse(is_valid_data(data + [valid_checksum + 1]))
     
+    def test_crc_algorithms(self):
+        self.assertEqual(checksum_bytes(b"123456789", "crc16"), 0x29B1)
+        self.assertEqual(checksum_bytes(b"123456789", "crc32"), 0xCBF43926)
+        payload = bytes(random.getrandbits(8) for _ in range(1000))
+        self.assertEqual(crc16_ccitt_table(payload), crc16_ccitt(payload))
+        for algorithm in ("crc16", "crc32", "sum8"):
+            streamed = Checksum(algorithm)
+            for i in range(0, len(payload), 64):
+                streamed.update(payload[i:i + 64])
+            self.assertEqual(streamed.value, checksum_bytes(payload, algorithm))
+        self.assertNotEqual(checksum([10, 20, 30, 40]), checksum([20, 10, 30, 40]))  # leituras trocadas
+
     def test_safe_reading(self):
         def faulty_sensor():
             return random.choice([-1, -5, 50, 105])
@@ -27,10 +70,49 @@ class TestFaultToleranceMethods(unittest.TestCase):
         self.assertIn(reading, range(0, 101))
     
     def test_backup_distance(self):
-        global last_valid_distance
-        last_valid_distance = 30
         self.assertEqual(get_distance_with_backup(40), 40)
         self.assertEqual(get_distance_with_backup(-5), 40)
+        self.assertEqual(get_distance_with_backup(-5, sensor="outro"), 50)  # estado independente por sensor
+
+    def test_backup_distance_per_stream(self):
+        self.assertEqual(get_distance_with_backup(30, sensor=0, stream="carro-a"), 30)
+        self.assertEqual(get_distance_with_backup(80, sensor=0, stream="carro-b"), 80)
+        self.assertEqual(get_distance_with_backup(-5, sensor=0, stream="carro-a"), 30)
+        self.assertEqual(get_distance_with_backup(-5, sensor=0, stream="carro-b"), 80)
+        with mock.patch("teste3.random.random", return_value=1.0):  # sem falhas simuladas
+            levels = [5, 10, 20, 40, 70]
+            get_beep_level_with_fault_tolerance([30] * 9, levels, stream="carro-c")
+            get_beep_level_with_fault_tolerance([90] * 9, levels, stream="carro-d")
+            # leituras fora do intervalo: cada veículo recupera a sua última leitura válida
+            get_beep_level_with_fault_tolerance([200] * 9, levels, stream="carro-c")
+            get_beep_level_with_fault_tolerance([200] * 9, levels, stream="carro-d")
+        self.assertEqual([sensor_state["carro-c", g].last_valid for g in range(3)], [30] * 3)
+        self.assertEqual([sensor_state["carro-d", g].last_valid for g in range(3)], [90] * 3)
+        self.assertEqual(sensor_state["carro-c", 0].faults, 1)
+
+    def test_state_store_streams(self):
+        import threading
+        store = StateStore(initial_value=50, shards=4)
+        kalman = KalmanFilter()
+        state = store["carro-1", 0]
+        for reading in (10, 12, 300, 11):
+            self.assertAlmostEqual(state.kalman(state.recover(reading)), kalman.update(state.last_valid), places=12)
+        self.assertEqual((state.last_valid, state.faults, state.updates, state.age), (11, 1, 3, 0))
+        self.assertEqual(store.recover(("carro-2", 0), -1), 50)
+
+        def worker(stream):
+            handle = store[stream]
+            for value in range(1000):
+                handle.recover(value % 150)
+
+        threads = [threading.Thread(target=worker, args=(f"fluxo-{i}",)) for i in range(50)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(store), 52)
+        self.assertTrue(all(store[f"fluxo-{i}"].faults == 294 for i in range(50)))
+        self.assertEqual(store.recall("nada", "x"), "x")
     
     def test_majority_voting(self):
         self.assertEqual(majority_voting([10, 10, 20]), 10)
@@ -48,5 +130,181 @@ class TestFaultToleranceMethods(unittest.TestCase):
         sensors_invalid = [300, 300, 300, -10, -10, -10, 10, 10, 10]  # Out-of-range values
         self.assertEqual(get_beep_level_with_fault_tolerance(sensors_invalid, levels), -1)
 
+    def test_vote3(self):
+        for triple in ([10, 10, 20], [30, 20, 20], [30, 30, 20], [5, 9, 7], [1, 2, 3], [4, 4, 4]):
+            self.assertEqual(vote3(*triple), majority_voting(triple))
+
+    def test_majority_voting_array_matches_scalar(self):
+        triples = [[random.randint(0, 4) for _ in range(3)] for _ in range(500)]
+        voted = majority_voting_array(triples)
+        self.assertEqual(voted.tolist(), [majority_voting(t) for t in triples])
+        voted = majority_voting_array(triples, fallback="first")
+        self.assertEqual(voted.tolist(), [teste2majorityvoting.majority_voting(t) for t in triples])
+        voted, agreement = majority_voting_array([[10, 11, 30], [5, 20, 40]], tolerance=1, return_agreement=True)
+        self.assertEqual(voted.tolist(), [10, 20])
+        self.assertEqual(agreement.tolist(), [True, False])
+
+    def test_beep_level_table_matches_scans(self):
+        for _ in range(50):
+            levels = [random.randint(0, 30) for _ in range(random.randint(0, 6))]
+            floor = BeepLevelTable(levels, "floor")
+            ceil = BeepLevelTable(levels, "ceil")
+            ceil_clamped = BeepLevelTable(levels, "ceil", overflow=len(levels) - 1)
+            distances = [random.randint(-2, 35) + random.choice([0, 0.5]) for _ in range(20)]
+            for d in distances:
+                self.assertEqual(floor.lookup(d), next((i for i, level in reversed(list(enumerate(levels))) if level <= d), 0))
+                self.assertEqual(ceil.lookup(d), next((i for i, level in enumerate(levels) if d <= level), len(levels)))
+                self.assertEqual(ceil_clamped.lookup(d), next((i for i, level in enumerate(levels) if d <= level), len(levels) - 1))
+            self.assertEqual(floor.lookup_array(distances).tolist(), [floor.lookup(d) for d in distances])
+            self.assertEqual(ceil.lookup_array(distances).tolist(), [ceil.lookup(d) for d in distances])
+        with self.assertRaises(ValueError):
+            BeepLevelTable([5, "a"])
+
+    def test_levels_validated_by_table(self):
+        levels = [5, 10, 20, 40, 70]
+        table = level_table(levels, "ceil")
+        self.assertIs(level_table(list(levels), "ceil"), table)
+        levels[0] = 6  # a lista mudou: a tabela é compilada de novo
+        self.assertEqual(level_table(levels, "ceil").levels, (6, 10, 20, 40, 70))
+        sensors = [30, 30, 30, 50, 50, 50]
+        for invalid in ([5, "a"], [5, -1], [5, float("nan")], [[5]]):
+            self.assertEqual(teste2majorityvoting.get_beep_level_with_fault_tolerance(sensors, invalid), -1)
+            self.assertEqual(get_beep_level_with_fault_tolerance(sensors, invalid), -1)
+        self.assertEqual(teste2majorityvoting.get_beep_level_with_fault_tolerance(sensors, []), 0)
+
+    def test_reject_outliers(self):
+        values = [10, 12, 80, 11, 9, 200]
+        median = statistics.median(values)
+        self.assertEqual(reject_outliers(values, 50), [v for v in values if abs(v - median) <= 50])
+
+    def test_beep_pipeline_keeps_filters_between_frames(self):
+        levels = [5, 10, 20, 40, 70]
+        pipeline = BeepPipeline(levels, groups=3)
+        frames = [[30, 30, 30, 31, 30, 30, 35, 35, 35]] * 20
+        results = list(pipeline.run(frames))
+        self.assertEqual(results[-1], 2)
+        self.assertEqual(pipeline.frames, 20)
+        self.assertAlmostEqual(pipeline.filters[0].estimate, 30, delta=0.5)
+        self.assertEqual(pipeline.process([30, 30, "a", 30, 30, 30, 30, 30, 30]), -1)
+        self.assertEqual(pipeline.process([30, 30, 30]), -1)
+        with self.assertRaises(ValueError):
+            BeepPipeline(["a", 10], groups=1)
+
+    def test_structured_frames_in_pipeline(self):
+        levels = [5, 10, 20, 40, 70]
+        readings = [[random.randint(0, 120) for _ in range(6)] for _ in range(100)]
+        readings[3][1] = -4
+        buffer = bytearray(make_frames(readings, stream=7).tobytes())
+        buffer[frame_dtype(2).itemsize * 10 + 20] ^= 0x01  # frame 10 corrompido
+        frames = frames_from_buffer(buffer, 2)
+        self.assertFalse(frames.flags.owndata)
+        self.assertEqual(frames["stream"][0], 7)
+        scalar = BeepPipeline(levels, groups=2)
+        expected = [-1 if i == 10 else scalar.process(row) for i, row in enumerate(frames["readings"].reshape(100, 6).tolist())]
+        self.assertEqual(expected[3], -1)
+        batch = BeepPipeline(levels, groups=2)
+        self.assertEqual(list(batch.run([frames[:50], frames[50:]])), expected)
+        with self.assertRaises(ValueError):
+            batch.process_batch(make_frames([[1] * 9]))
+
+    def test_replay_log_in_batches(self):
+        levels = [5, 10, 20, 40, 70]
+        frames = np.concatenate(list(reverse_drive_batches(500, groups=3, batch=128)))
+        frames["readings"][42, 1] = 250  # fora do intervalo: usa a última leitura válida
+        frames["crc"][99] ^= 1  # frame corrompido
+        expected = BeepPipeline(levels, groups=3).process_batch(frames)
+        self.assertEqual(expected[99], -1)
+        with tempfile.TemporaryDirectory() as tmp:
+            log, out = os.path.join(tmp, "drive.log"), os.path.join(tmp, "levels.bin")
+            self.assertEqual(write_log(log, [frames[:300], frames[300:]], groups=3), 500)
+            self.assertEqual(replay(log, out, levels, batch=37), 500)
+            self.assertEqual(read_levels(out).tolist(), expected.tolist())
+            with self.assertRaises(ValueError):
+                replay(log, out, levels, pipeline=BeepPipeline(levels, groups=2))
+
+    def test_async_ingestion_deadline(self):
+        attempts = iter([150, -3, 42])  # duas leituras inválidas e depois uma válida
+
+        def flaky():
+            return next(attempts)
+
+        sensors = [SimulatedSensor(20), flaky, SimulatedSensor(30, latency=0.2)]
+        ingestor = SensorIngestor(sensors, period=0.02, initial_distance=60)
+
+        async def read_two():
+            return [await ingestor.read_frame() for _ in range(2)]
+
+        start = time.perf_counter()
+        first, second = asyncio.run(read_two())
+        self.assertLess(time.perf_counter() - start, 0.15)  # o sensor lento não atrasa os frames
+        self.assertEqual(first.readings, [20, 42, 60])
+        self.assertEqual(first.fresh, [True, True, False])
+        self.assertEqual(ingestor.late, [0, 0, 2])
+        self.assertEqual(second.readings[1], 42)  # sem mais leituras: última válida deste sensor
+        self.assertEqual(ingestor.failures, [0, 1, 0])
+
+    def test_blocking_sensor_does_not_stall_frame(self):
+        def blocking():
+            time.sleep(0.1)  # leitura síncrona bloqueante
+            return 10
+
+        ingestor = SensorIngestor([blocking, SimulatedSensor(20), lambda: 30], period=0.02, initial_distance=60)
+        async def timed_frame():
+            start = time.perf_counter()
+            frame = await ingestor.read_frame()
+            return frame, time.perf_counter() - start
+
+        frame, elapsed = asyncio.run(timed_frame())
+        self.assertLess(elapsed, 0.05)  # não espera pela leitura bloqueante
+        self.assertEqual(frame.readings, [60, 20, 30])
+        self.assertEqual(ingestor.late, [1, 0, 0])
+
+    def test_multi_stream_server(self):
+        levels = [5, 10, 20, 40, 70]
+        readings = np.random.default_rng(3).integers(-1, 130, size=(40, 6, 2, 3))  # tick x veículo x grupos x 3
+        expected = {stream: [] for stream in range(6)}
+        pipelines = {stream: BeepPipeline(levels, groups=2) for stream in range(6)}
+        for tick in readings:
+            for stream in range(6):
+                expected[stream].append(pipelines[stream].process(tick[stream].reshape(-1).tolist()))
+
+        async def run():
+            server = BeepServer(levels, groups=2, tick=0.002)
+            await server.start(port=0)
+            port = server.server.sockets[0].getsockname()[1]
+            gateways = [await BeepClient(2).connect(port=port) for _ in range(2)]
+            got = {stream: [] for stream in range(6)}
+            for tick in readings:
+                # o gateway 0 envia os veículos 0-2 num pacote, o gateway 1 os veículos 3-5
+                packets = [make_frames(tick[g * 3:g * 3 + 3], stream=np.arange(g * 3, g * 3 + 3)) for g in range(2)]
+                answers = await asyncio.gather(*(c.evaluate(p) for c, p in zip(gateways, packets)))
+                for g, answer in enumerate(answers):
+                    for i, level in enumerate(answer.tolist()):
+                        got[g * 3 + i].append(level)
+            for client in gateways:
+                await client.close()
+            await server.close()
+            return got, server.ticks
+
+        got, ticks = asyncio.run(run())
+        self.assertEqual(got, expected)
+        self.assertLess(ticks, 80)  # os pacotes dos dois gateways partilham lotes
+
+    def test_multi_stream_pipeline(self):
+        levels = [5, 10, 20, 40, 70]
+        rng = np.random.default_rng(4)
+        streams = rng.integers(0, 4, size=300)  # vários frames do mesmo fluxo em cada lote
+        readings = rng.integers(-1, 130, size=(300, 2, 3))
+        pipelines = {stream: BeepPipeline(levels, groups=2) for stream in range(4)}
+        expected = [pipelines[s].process(r.reshape(-1).tolist()) for s, r in zip(streams.tolist(), readings)]
+        multi = MultiStreamPipeline(levels, groups=2, capacity=1)  # obriga a crescer os arrays de estado
+        got = []
+        for start in range(0, 300, 37):
+            frames = make_frames(readings[start:start + 37], stream=streams[start:start + 37])
+            got.extend(multi.process_frames(frames).tolist())
+        self.assertEqual(got, expected)
+        self.assertEqual(len(multi), 4)
+        self.assertEqual(multi.process_frames(np.zeros(0, dtype=frame_dtype(2))).tolist(), [])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,189 @@
+import asyncio
+import inspect
+import random
+from collections import namedtuple
+
+# Aquisição assíncrona das leituras dos sensores (FR4).
+# Todos os sensores são lidos em simultâneo dentro do período de um frame (10 ms).
+# Cada sensor tem Retry com um orçamento de latência (até ao deadline do frame) e a
+# sua própria última leitura válida (Backward Recovery por sensor, em vez da global
+# last_valid_distance de teste3.py). Quando o deadline chega o frame é emitido na
+# mesma: os sensores atrasados ou falhados entram com a última leitura válida.
+
+Frame = namedtuple("Frame", ["timestamp", "readings", "fresh"])
+
+
+class SimulatedSensor:
+    """
+    Sensor local para testes: devolve 'value' (número ou função sem argumentos) após
+    'latency' segundos (+ jitter aleatório); com probabilidade 'fault_rate' a leitura
+    sai fora do intervalo válido (falha transitória).
+    """
+
+    def __init__(self, value, latency=0.001, jitter=0.0, fault_rate=0.0, seed=None):
+        self.value = value
+        self.latency = latency
+        self.jitter = jitter
+        self.fault_rate = fault_rate
+        self.random = random.Random(seed)
+        self.reads = 0
+
+    async def __call__(self):
+        self.reads += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.random.random() < self.fault_rate:
+            return self.random.choice((-1, 255))
+        return self.value() if callable(self.value) else self.value
+
+
+def _is_async(sensor):
+    return inspect.iscoroutinefunction(sensor) or inspect.iscoroutinefunction(getattr(sensor, "__call__", None))
+
+
+def _call_sync(sensor):
+    try:
+        return sensor()
+    except StopIteration as e:  # o asyncio não consegue passar StopIteration por um future
+        raise RuntimeError("o sensor lançou StopIteration") from e
+
+
+async def _read(sensor):
+    """
+    Lê um sensor: um sensor async corre no event loop; um sensor síncrono corre numa thread
+    (asyncio.to_thread), para que uma leitura bloqueante não pare os outros sensores e
+    possa ser abandonada no deadline.
+    """
+    if _is_async(sensor):
+        return await sensor()
+    reading = await asyncio.to_thread(_call_sync, sensor)
+    if inspect.isawaitable(reading):
+        reading = await reading
+    return reading
+
+
+async def safe_reading_async(sensor, deadline, retries=3, valid_range=(0, 100), retry_delay=0.0):
+    """
+    Retry Mechanism assíncrono: tenta ler o sensor até 'retries' vezes, sem ultrapassar
+    'deadline' (tempo do event loop). Devolve a leitura ou -1 se falhar ou se o tempo acabar.
+    """
+    loop = asyncio.get_running_loop()
+    low, high = valid_range
+    for attempt in range(retries):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            reading = await asyncio.wait_for(_read(sensor), remaining)
+        except asyncio.TimeoutError:
+            break
+        except Exception:
+            reading = None  # erro do sensor conta como uma tentativa falhada
+        if isinstance(reading, (int, float)) and low <= reading <= high:
+            return reading
+        if retry_delay and attempt + 1 < retries:
+            await asyncio.sleep(min(retry_delay, max(0, deadline - loop.time())))
+    return -1
+
+
+class SensorIngestor:
+    """
+    Lê um conjunto de sensores em paralelo, um frame por período.
+
+    Parâmetros:
+        sensors (list): callables sem argumentos (síncronos ou async) que devolvem uma leitura;
+                        a ordem é a dos frames de get_beep_level_with_fault_tolerance. Os síncronos
+                        correm em threads: um sensor bloqueado conta como atrasado, mas a sua
+                        thread só fica livre quando a leitura terminar
+        period (float): período de um frame em segundos (10 ms)
+        budget (float): orçamento de latência de cada frame (por omissão 80% do período)
+        retries (int): tentativas por sensor e por frame
+        valid_range (tuple): intervalo de leituras válidas
+        initial_distance (float): última leitura válida inicial de cada sensor
+    """
+
+    def __init__(self, sensors, period=0.01, budget=None, retries=3, valid_range=(0, 100),
+                 initial_distance=50, retry_delay=0.0):
+        if not sensors:
+            raise ValueError("sensors deve ser uma lista não vazia")
+        if budget is not None and not 0 < budget <= period:
+            raise ValueError("budget deve estar entre 0 e period")
+        self.sensors = list(sensors)
+        self.period = period
+        self.budget = period * 0.8 if budget is None else budget
+        self.retries = retries
+        self.valid_range = valid_range
+        self.retry_delay = retry_delay
+        self.last_valid = [initial_distance] * len(self.sensors)
+        self.late = [0] * len(self.sensors)  # deadline ultrapassado
+        self.failures = [0] * len(self.sensors)  # todas as tentativas falharam
+        self.frames = 0
+
+    async def read_frame(self):
+        """Lê todos os sensores e devolve um Frame no máximo 'budget' segundos depois."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + self.budget
+        tasks = [asyncio.ensure_future(safe_reading_async(sensor, deadline, self.retries, self.valid_range,
+                                                          self.retry_delay))
+                 for sensor in self.sensors]
+        done, pending = await asyncio.wait(tasks, timeout=max(0, deadline - loop.time()))
+        for task in pending:
+            task.cancel()
+
+        readings = self.last_valid[:]
+        fresh = [False] * len(tasks)
+        for i, task in enumerate(tasks):
+            if task not in done:
+                self.late[i] += 1
+                continue
+            reading = task.result()
+            if reading == -1:
+                self.failures[i] += 1
+                continue
+            readings[i] = self.last_valid[i] = reading
+            fresh[i] = True
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        self.frames += 1
+        return Frame(start, readings, fresh)
+
+    async def frames_iter(self, count=None):
+        """
+        Async iterator de frames ao ritmo de 'period' (listas planas de leituras, prontas
+        para BeepPipeline.arun). Um frame atrasado não acumula atraso nos seguintes.
+        """
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        produced = 0
+        while count is None or produced < count:
+            frame = await self.read_frame()
+            produced += 1
+            yield frame.readings
+            next_tick = max(next_tick + self.period, loop.time())
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+
+
+async def _demo(frames=20):
+    from beeppipeline import BeepPipeline
+
+    distance = [100.0]
+
+    def approaching():
+        distance[0] = max(0.0, distance[0] - 0.4)
+        return round(distance[0])
+
+    sensors = [SimulatedSensor(approaching, latency=0.001, jitter=0.004, fault_rate=0.1, seed=i) for i in range(9)]
+    sensors[4].latency = 0.02  # sensor lento: fica sempre atrasado
+    ingestor = SensorIngestor(sensors)
+    pipeline = BeepPipeline([5, 10, 20, 40, 70], groups=3)
+    i = 0
+    async for level in pipeline.arun(ingestor.frames_iter(frames)):
+        i += 1
+        print(f"Frame {i}: beep level {level}")
+    print(f"Atrasos por sensor: {ingestor.late} | Falhas por sensor: {ingestor.failures}")
+
+
+if __name__ == '__main__':
+    asyncio.run(_demo())
@@ -0,0 +1,109 @@
+import array
+import binascii
+import sys
+import zlib
+import numpy as np
+
+# Information Redundancy: códigos de verificação sobre leituras empacotadas em binário.
+#   "crc32" - CRC-32 (IEEE 802.3), via zlib.crc32
+#   "crc16" - CRC-16/CCITT-FALSE (polinómio 0x1021, valor inicial 0xFFFF), via binascii.crc_hqx
+#   "sum8"  - soma módulo 256 dos bytes (não deteta bytes trocados); ao contrário do checksum
+#             original de teste3, sum(data) % 256, soma os bytes das leituras empacotadas
+#             em float64 e não os valores, por isso dá resultados diferentes
+# Todos aceitam um valor anterior, por isso podem ser atualizados por blocos (streaming).
+
+
+def _crc16_table(poly=0x1021):
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+
+CRC16_TABLE = _crc16_table()
+
+
+def crc16_ccitt_table(data, crc=0xFFFF):
+    """CRC-16/CCITT em Python puro, com tabela (referência para crc16_ccitt)."""
+    table = CRC16_TABLE
+    for byte in memoryview(data).cast('B'):
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+    return crc
+
+
+def crc16_ccitt(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE; binascii.crc_hqx implementa o mesmo algoritmo de tabela em C."""
+    return binascii.crc_hqx(data, crc)
+
+
+def crc32(data, crc=0):
+    return zlib.crc32(data, crc)
+
+
+def sum8(data, crc=0):
+    return (crc + sum(memoryview(data).cast('B'))) % 256
+
+
+# nome -> (função, valor inicial, tamanho em bytes)
+ALGORITHMS = {
+    "crc32": (crc32, 0, 4),
+    "crc16": (crc16_ccitt, 0xFFFF, 2),
+    "sum8": (sum8, 0, 1),
+}
+
+
+def get_algorithm(name):
+    if name not in ALGORITHMS:
+        raise ValueError(f"Algoritmo desconhecido '{name}', esperado um de {tuple(ALGORITHMS)}")
+    return ALGORITHMS[name]
+
+
+class Checksum:
+    """
+    Código de verificação incremental: update() com cada bloco recebido, value no fim.
+
+    Parâmetros:
+        algorithm (str): "crc32", "crc16" ou "sum8"
+    """
+
+    def __init__(self, algorithm="crc32"):
+        self.algorithm = algorithm
+        self._func, self.value, self.size = get_algorithm(algorithm)
+
+    def update(self, chunk):
+        self.value = self._func(chunk, self.value)
+        return self
+
+    def copy(self):
+        other = Checksum(self.algorithm)
+        other.value = self.value
+        return other
+
+
+def checksum_bytes(data, algorithm="crc32"):
+    func, initial, _ = get_algorithm(algorithm)
+    return func(data, initial)
+
+
+def pack_readings(readings):
+    """Empacota leituras numéricas como float64 little-endian (array.array, sem listas intermédias)."""
+    packed = readings if isinstance(readings, array.array) and readings.typecode == 'd' else array.array('d', readings)
+    if sys.byteorder != 'little':
+        packed = array.array('d', packed)
+        packed.byteswap()
+    return packed
+
+
+def record_checksums(records, algorithm="crc32", skip_tail=0):
+    """
+    Código de verificação de cada registo de um array estruturado, sobre os seus bytes
+    exceto os últimos 'skip_tail' (onde normalmente está guardado o próprio código).
+    """
+    func, initial, _ = get_algorithm(algorithm)
+    records = np.ascontiguousarray(records)
+    rows = records.view(np.uint8).reshape(len(records), records.dtype.itemsize)
+    end = rows.shape[1] - skip_tail
+    return np.fromiter((func(row[:end], initial) for row in rows), dtype=np.uint32, count=len(rows))
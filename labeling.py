@@ -0,0 +1,382 @@
+import numpy as np
+
+# Connected-component labeling (4-connectivity) over NumPy masks.
+# Each row of the mask is split into horizontal runs of foreground pixels;
+# a run touches every run of the previous row whose columns overlap it, and
+# touching runs are merged with a union-find table. The number of objects is
+# the number of runs minus the number of successful merges.
+
+
+class UnionFind:
+    """Union-find over integer labels with path halving and union by index."""
+
+    def __init__(self, size=0):
+        self.parent = list(range(size))
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self):
+        """Creates a new singleton label and returns it."""
+        label = len(self.parent)
+        self.parent.append(label)
+        return label
+
+    def grow(self, size):
+        """Makes sure labels 0..size-1 exist."""
+        parent = self.parent
+        if size > len(parent):
+            parent.extend(range(len(parent), size))
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        """Merges the sets of a and b. Returns True if they were separate."""
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        # the smaller label stays the root so labels are stable across merges
+        if ra < rb:
+            self.parent[rb] = ra
+        else:
+            self.parent[ra] = rb
+        return True
+
+    def roots(self):
+        """Returns an array with the root of every label."""
+        return np.fromiter((self.find(x) for x in range(len(self.parent))), dtype=np.int64, count=len(self.parent))
+
+
+def find_runs(mask):
+    """
+    Returns the horizontal runs of True pixels in a 2-D boolean mask.
+
+    The result is (rows, starts, ends) as int64 arrays, sorted by row and then by
+    start column; 'ends' is exclusive.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    height, width = mask.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows.astype(np.int64), starts.astype(np.int64), ends.astype(np.int64)
+
+
+def overlapping_runs(rows, starts, ends, width):
+    """
+    Returns the (run, previous_row_run) index pairs of runs that touch vertically.
+
+    Runs must come from find_runs (sorted by row, then column). A run in row r
+    touches a run in row r - 1 when their column ranges overlap.
+    """
+    if len(rows) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    stride = width + 1
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+    above = (rows - 1) * stride
+    lo = np.searchsorted(end_keys, above + starts, side="right")
+    hi = np.searchsorted(start_keys, above + ends, side="left")
+    counts = np.maximum(hi - lo, 0)
+    current = np.repeat(np.arange(len(rows), dtype=np.int64), counts)
+    offsets = np.arange(counts.sum(), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+    previous = np.repeat(lo, counts) + offsets
+    return current, previous
+
+
+def label_runs(mask):
+    """
+    Labels the runs of a 2-D mask.
+
+    Returns (runs, union_find, count), where runs is the (rows, starts, ends)
+    tuple from find_runs, union_find merges run indices into objects and count
+    is the number of 4-connected objects.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    runs = find_runs(mask)
+    current, previous = overlapping_runs(*runs, mask.shape[1])
+    union_find = UnionFind(len(runs[0]))
+    merges = 0
+    for a, b in zip(current.tolist(), previous.tolist()):
+        if union_find.union(a, b):
+            merges += 1
+    return runs, union_find, len(runs[0]) - merges
+
+
+def count_components(mask):
+    """Returns the number of 4-connected objects in a 2-D boolean mask."""
+    return label_runs(mask)[2]
+
+
+def label_image(mask):
+    """
+    Returns (labels, count) for a 2-D boolean mask.
+
+    'labels' is an int32 array with 0 for background and 1..count for objects,
+    numbered in raster order of their first pixel.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    (rows, starts, ends), union_find, count = label_runs(mask)
+    labels = np.zeros(mask.shape, dtype=np.int32)
+    if count == 0:
+        return labels, 0
+    # the root of each object is its first run in raster order (union keeps the smaller label)
+    _, dense = np.unique(union_find.roots(), return_inverse=True)
+    run_labels = (dense + 1).astype(np.int32)
+    lengths = ends - starts
+    flat = labels.reshape(-1)
+    positions = np.repeat(rows * mask.shape[1] + starts, lengths)
+    positions += np.arange(lengths.sum(), dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    flat[positions] = np.repeat(run_labels, lengths)
+    return labels, count
+
+
+def label_strip(mask):
+    """
+    Labels one horizontal strip of a larger mask for merge_strips.
+
+    Returns (count, runs, top, bottom): the number of objects inside the strip, the
+    number of runs, and the (starts, ends, roots) of the runs in its first and last
+    rows, where roots identify the strip's objects (run indices).
+    """
+    mask = np.asarray(mask, dtype=bool)
+    (rows, starts, ends), union_find, count = label_runs(mask)
+    roots = union_find.roots()
+    first = rows == 0
+    last = rows == mask.shape[0] - 1
+    return (count, len(rows),
+            (starts[first], ends[first], roots[first]),
+            (starts[last], ends[last], roots[last]))
+
+
+def merge_strips(strips):
+    """
+    Returns the number of objects of a mask from the label_strip results of its
+    consecutive strips, merging the objects that touch across each strip border.
+    """
+    total = sum(strip[0] for strip in strips)
+    union_find = UnionFind()
+    ids = {}
+
+    def node(key):
+        label = ids.get(key)
+        if label is None:
+            label = ids[key] = union_find.add()
+        return label
+
+    merges = 0
+    for k in range(len(strips) - 1):
+        above_starts, above_ends, above_roots = strips[k][3]
+        below_starts, below_ends, below_roots = strips[k + 1][2]
+        # runs of the row above overlapping each run below (both sorted by column)
+        lo = np.searchsorted(above_ends, below_starts, side="right")
+        hi = np.searchsorted(above_starts, below_ends, side="left")
+        for b, (first, last) in enumerate(zip(lo.tolist(), hi.tolist())):
+            for a in range(first, last):
+                if union_find.union(node((k, int(above_roots[a]))), node((k + 1, int(below_roots[b])))):
+                    merges += 1
+    return total - merges
+
+
+class StreamingCounter:
+    """
+    Counts objects of an image fed one row at a time, in O(width) memory.
+
+    Only the runs of the previous row are kept, each with the id of its object among
+    the objects still open; a union-find over those ids and the new row's runs merges
+    objects that meet, and ids are compacted after every row so the table never grows
+    beyond the width. 'count' is exact for the rows seen so far; objects seen separately
+    may still merge in later rows.
+    """
+
+    def __init__(self, threshold, width=None):
+        self.threshold = threshold
+        self.width = width
+        self.rows = 0
+        self.count = 0
+        self._starts = np.empty(0, dtype=np.int64)
+        self._ends = np.empty(0, dtype=np.int64)
+        self._ids = []
+
+    def push(self, row):
+        """Adds the next row and returns the count so far."""
+        mask = np.asarray(row) > self.threshold
+        if mask.ndim != 1:
+            raise ValueError("each row must be 1-D")
+        if self.width is None:
+            self.width = len(mask)
+        elif len(mask) != self.width:
+            raise ValueError(f"row {self.rows} has {len(mask)} pixels, expected {self.width}")
+        padded = np.zeros(len(mask) + 2, dtype=np.int8)
+        padded[1:-1] = mask
+        edges = np.diff(padded)
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+
+        previous = len(self._ids)
+        union_find = UnionFind(previous + len(starts))
+        merges = 0
+        if previous and len(starts):
+            # runs of the previous row overlapping each new run (both sorted by column)
+            lo = np.searchsorted(self._ends, starts, side="right").tolist()
+            hi = np.searchsorted(self._starts, ends, side="left").tolist()
+            ids = self._ids
+            for j in range(len(starts)):
+                for a in range(lo[j], hi[j]):
+                    if union_find.union(ids[a], previous + j):
+                        merges += 1
+        self.count += len(starts) - merges
+
+        # compact: the new row's objects get ids 0..k-1, everything else is closed
+        compact = {}
+        self._ids = [compact.setdefault(union_find.find(previous + j), len(compact)) for j in range(len(starts))]
+        self._starts, self._ends = starts, ends
+        self.rows += 1
+        return self.count
+
+    def finish(self):
+        """Returns the final count once the last row has been pushed."""
+        return self.count
+
+
+def count_rows(rows, threshold, width=None):
+    """Counts the objects of an image given as an iterable of rows (see StreamingCounter)."""
+    counter = StreamingCounter(threshold, width)
+    for row in rows:
+        counter.push(row)
+    return counter.finish()
+
+
+def _bounding_boxes(labels, count):
+    """Returns (top, left, bottom, right) arrays, bottom/right exclusive, for labels 1..count (index 0 unused)."""
+    ys, xs = np.nonzero(labels)
+    ids = labels[ys, xs]
+    top = np.full(count + 1, labels.shape[0], dtype=np.int64)
+    left = np.full(count + 1, labels.shape[1], dtype=np.int64)
+    bottom = np.zeros(count + 1, dtype=np.int64)
+    right = np.zeros(count + 1, dtype=np.int64)
+    np.minimum.at(top, ids, ys)
+    np.minimum.at(left, ids, xs)
+    np.maximum.at(bottom, ids, ys + 1)
+    np.maximum.at(right, ids, xs + 1)
+    return top, left, bottom, right
+
+
+class IncrementalCounter:
+    """
+    Object counter for consecutive frames of the same size that relabels only what changed.
+
+    The label map of the previous frame and the bounding box of every object are kept.
+    For a new frame only the objects touching a changed pixel can split, merge, grow or
+    vanish, and every new object containing a changed pixel lies inside the union of
+    their boxes and the changed area; that window alone is relabeled with label_runs.
+    Objects outside the window keep their labels. Labels are not dense: ids freed by
+    vanished objects are reused.
+
+    debug = True recounts every frame from scratch and raises AssertionError on a mismatch.
+    """
+
+    def __init__(self, threshold, debug=False):
+        self.threshold = threshold
+        self.debug = debug
+        self.mask = None
+        self.labels = None
+        self.count = 0
+        self.boxes = {}  # label -> (top, left, bottom, right), bottom/right exclusive
+        self._free = []
+        self._next = 1
+        self.relabeled = 0  # pixels relabeled by the last update
+
+    def reset(self, image):
+        """Labels a frame from scratch and returns its object count."""
+        self.mask = np.asarray(image) > self.threshold
+        if self.mask.ndim != 2:
+            raise ValueError("image must be 2-D")
+        self.labels, self.count = label_image(self.mask)
+        top, left, bottom, right = _bounding_boxes(self.labels, self.count)
+        self.boxes = {label: (int(top[label]), int(left[label]), int(bottom[label]), int(right[label]))
+                      for label in range(1, self.count + 1)}
+        self._free = []
+        self._next = self.count + 1
+        self.relabeled = self.mask.size
+        return self.count
+
+    def update(self, image, dirty=None):
+        """
+        Returns the object count of the next frame.
+
+        image = The whole new frame, or only the contents of 'dirty' if its shape matches it
+        dirty = (top, left, bottom, right) rectangle (bottom/right exclusive) outside of which
+                the frame is promised not to have changed; default: the whole frame is diffed
+        """
+        if self.mask is None:
+            if dirty is not None:
+                raise ValueError("the first frame must be a whole frame")
+            return self.reset(image)
+        height, width = self.mask.shape
+        top, left, bottom, right = (0, 0, height, width) if dirty is None else dirty
+        if not (0 <= top <= bottom <= height and 0 <= left <= right <= width):
+            raise ValueError(f"dirty rectangle {dirty} is outside the {height}x{width} frame")
+        pixels = np.asarray(image)
+        if pixels.shape == (height, width):
+            pixels = pixels[top:bottom, left:right]
+        elif pixels.shape != (bottom - top, right - left):
+            raise ValueError(f"image shape {pixels.shape} matches neither the frame nor the dirty rectangle")
+        region = pixels > self.threshold
+        changed = region != self.mask[top:bottom, left:right]
+        self.relabeled = 0
+        if not changed.any():
+            return self._checked()
+
+        # bounding box of the changed pixels, grown by one pixel to reach the objects touching them
+        changed_rows = np.flatnonzero(changed.any(axis=1))
+        changed_cols = np.flatnonzero(changed.any(axis=0))
+        r0 = max(top + int(changed_rows[0]) - 1, 0)
+        r1 = min(top + int(changed_rows[-1]) + 2, height)
+        c0 = max(left + int(changed_cols[0]) - 1, 0)
+        c1 = min(left + int(changed_cols[-1]) + 2, width)
+        self.mask[top:bottom, left:right] = region
+
+        affected = np.unique(self.labels[r0:r1, c0:c1])
+        affected = affected[affected != 0].tolist()
+        for label in affected:
+            b_top, b_left, b_bottom, b_right = self.boxes.pop(label)
+            r0, c0 = min(r0, b_top), min(c0, b_left)
+            r1, c1 = max(r1, b_bottom), max(c1, b_right)
+
+        # relabel the window, leaving out the pixels of objects that were not affected
+        window = self.labels[r0:r1, c0:c1]
+        keep = window == 0
+        if affected:
+            keep |= np.isin(window, affected)
+        new_labels, new_count = label_image(self.mask[r0:r1, c0:c1] & keep)
+        self._free.extend(affected)
+        ids = np.zeros(new_count + 1, dtype=np.int32)
+        for i in range(1, new_count + 1):
+            if self._free:
+                ids[i] = self._free.pop()
+            else:
+                ids[i] = self._next
+                self._next += 1
+        window[keep] = ids[new_labels[keep]]
+        b_top, b_left, b_bottom, b_right = _bounding_boxes(new_labels, new_count)
+        for i in range(1, new_count + 1):
+            self.boxes[int(ids[i])] = (r0 + int(b_top[i]), c0 + int(b_left[i]), r0 + int(b_bottom[i]), c0 + int(b_right[i]))
+        self.count += new_count - len(affected)
+        self.relabeled = window.size
+        return self._checked()
+
+    def _checked(self):
+        if self.debug:
+            expected = count_components(self.mask)
+            assert self.count == expected, f"incremental count {self.count} != full recount {expected}"
+            assert len(self.boxes) == self.count, "bounding boxes out of sync with the count"
+        return self.count
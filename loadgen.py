@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import multiprocessing
+import sys
+import time
+import numpy as np
+from beepserver import BeepClient, BeepServer
+from sensorframe import make_frames
+
+# Gerador de carga para beepserver.py: 'streams' veículos simulados enviam um frame
+# por período (10 ms). Os veículos são repartidos por 'connections' ligações (uma por
+# veículo, ou um gateway que junta vários veículos num pacote); mede-se a latência de
+# cada resposta e no fim compara-se o débito e a latência p99 com os objetivos dados.
+
+
+async def _connection(streams, groups, host, port, path, period, deadline, latencies, rng):
+    client = await BeepClient(groups).connect(host, port, path)
+    streams = np.asarray(streams)
+    distance = rng.uniform(20, 100, size=len(streams))
+    next_send = time.perf_counter()
+    frames = 0
+    try:
+        while time.perf_counter() < deadline:
+            distance = np.maximum(0.0, distance - rng.uniform(0, 0.5, size=len(streams)))
+            readings = distance[:, None, None] + rng.integers(-1, 2, size=(len(streams), groups, 3))
+            packet = make_frames(readings, timestamps=np.full(len(streams), next_send), stream=streams)
+            start = time.perf_counter()
+            await client.evaluate(packet)
+            latencies.append(time.perf_counter() - start)
+            frames += len(packet)
+            next_send += period
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+    finally:
+        await client.close()
+    return frames
+
+
+async def run_load(streams=200, groups=3, duration=5.0, period=0.01, host="127.0.0.1", port=8765, path=None,
+                   connections=None, seed=0):
+    """Corre a carga e devolve (frames por segundo, latências dos pacotes em segundos)."""
+    connections = streams if connections is None else min(connections, streams)
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + duration
+    rng = np.random.default_rng(seed)
+    frames = await asyncio.gather(*(_connection(range(c, streams, connections), groups, host, port, path, period,
+                                                deadline, latencies, np.random.default_rng(rng.integers(1 << 32)))
+                                    for c in range(connections)))
+    elapsed = time.perf_counter() - start
+    return sum(frames) / elapsed, np.array(latencies)
+
+
+def _serve(groups, port, path, ready):
+    async def main():
+        server = BeepServer([5, 10, 20, 40, 70], groups)
+        await server.start(port=port, path=path)
+        ready.set()
+        await server.server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gerador de carga para beepserver.py")
+    parser.add_argument("--streams", type=int, default=200, help="veículos simulados")
+    parser.add_argument("--connections", type=int, default=None, help="ligações (por omissão uma por veículo)")
+    parser.add_argument("--groups", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--period", type=float, default=0.01, help="período de um frame por veículo (s)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="caminho de um Unix socket (em vez de TCP)")
+    parser.add_argument("--spawn", action="store_true", help="inicia o servidor num processo separado")
+    parser.add_argument("--target-fps", type=float, default=None,
+                        help="débito mínimo em frames/s (por omissão 95%% do débito oferecido)")
+    parser.add_argument("--target-p99-ms", type=float, default=10.0, help="latência p99 máxima (ms)")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        ready = multiprocessing.Event()
+        server = multiprocessing.Process(target=_serve, args=(args.groups, args.port, args.unix, ready), daemon=True)
+        server.start()
+        if not ready.wait(10):
+            sys.exit("o servidor não arrancou")
+    try:
+        fps, latencies = asyncio.run(run_load(args.streams, args.groups, args.duration, args.period,
+                                              args.host, args.port, args.unix, args.connections))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+    target_fps = args.target_fps if args.target_fps is not None else 0.95 * args.streams / args.period
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000 if len(latencies) else (float("inf"),) * 2
+    print(f"{args.streams} veículos, {len(latencies)} pacotes em {args.duration:.1f} s")
+    print(f"  débito  {fps:10.0f} frames/s  (objetivo >= {target_fps:.0f})")
+    print(f"  latência p50 {p50:6.2f} ms   p99 {p99:6.2f} ms  (objetivo p99 <= {args.target_p99_ms:.1f} ms)")
+    ok = fps >= target_fps and p99 <= args.target_p99_ms
+    print("  OK" if ok else "  FALHOU")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,13 @@
+import statistics
+
+# OUTLIER DETECTION: leituras que se afastam mais de 'max_change' da mediana do frame.
+# A mediana é calculada uma única vez por frame, e não uma vez por leitura (O(n log n)
+# em vez de O(n² log n) com centenas de grupos de sensores).
+
+
+def reject_outliers(values, max_change):
+    """Devolve as leituras que não se afastam mais de 'max_change' da mediana."""
+    if not values:
+        return []
+    median = statistics.median(values)
+    return [value for value in values if abs(value - median) <= max_change]
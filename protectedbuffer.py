@@ -0,0 +1,172 @@
+import logging
+import zlib
+from array import array
+import numpy as np
+from reedsolo import ReedSolomonError
+from chunkedrs import ChunkedRSCodec, ParityWorkspace
+
+# One codec per (parity level, block bytes), shared by every buffer
+_codecs = {}
+
+
+def get_codec(nsym, chunk_size=None):
+    key = (nsym, chunk_size)
+    if key not in _codecs:
+        _codecs[key] = ChunkedRSCodec(nsym, chunk_size=chunk_size)
+    return _codecs[key]
+
+
+class ProtectedBuffer:
+    '''
+    Contiguous array protected block by block (Information Redundancy).
+
+    The data is stored once; every block keeps a CRC32 for detection and
+    Reed-Solomon parity for repair. A block is verified (and repaired if its CRC
+    no longer matches) the first time it is read, and the result is cached until
+    that block is written again, so reading a whole frame costs one pass of
+    checks instead of one decode per access.
+
+    load() puts new data into the same buffer, so a buffer kept for a stream of
+    frames does not allocate its storage, parity and CRCs again for every frame.
+
+    Input Parameters:
+        data = Scalar, list (of lists) or ndarray to protect
+        dtype = NumPy dtype used to store the data
+        block_size = Elements per block (default: as many as fit in one RS codeword)
+        nsym = Number of Reed-Solomon parity bytes per block
+        codec = ChunkedRSCodec to use instead of a default one with 'nsym' parity bytes
+    '''
+
+    def __init__(self, data, dtype=np.float64, block_size=None, nsym=10, codec=None):
+        self.data = np.array(data, dtype=dtype)
+        self.shape = self.data.shape
+        self._flat = self.data.reshape(-1)
+        self._bytes = memoryview(self._flat).cast('B')
+        self.itemsize = self._flat.itemsize
+        codec = codec or get_codec(nsym)
+        self.nsym = codec.nsym
+        max_block = codec.chunk_size // self.itemsize
+        self.block_size = block_size or max_block
+        if not 0 < self.block_size <= (255 - self.nsym) // self.itemsize:
+            raise ValueError(f"block_size must be between 1 and {(255 - self.nsym) // self.itemsize} elements for nsym={self.nsym}")
+        block_bytes = self.block_size * self.itemsize
+        if codec.chunk_size != block_bytes:
+            codec = ChunkedRSCodec(self.nsym, chunk_size=block_bytes, workers=codec.workers,
+                                   pool=codec.pool, group_size=codec.group_size)
+        self._codec = codec
+        self.blocks = -(-self._flat.size // self.block_size)
+        self._verified = bytearray(self.blocks)
+        self.checks = 0  # blocks verified since creation
+        self.repairs = 0  # blocks repaired from parity
+        # parity of the whole buffer in one chunked pass, CRCs block by block
+        self._parity = codec.parity(self._bytes)
+        self._crc = array('I', [zlib.crc32(self._bytes[i:i + block_bytes]) for i in range(0, len(self._bytes), block_bytes)])
+        # capacity reused by load(); the encoder's work arrays are only kept once load() is used
+        self._storage = self._flat
+        self._parity_storage = self._parity
+        self._work = None
+
+    def load(self, data):
+        """
+        Replaces the contents with 'data' (any shape, converted to the buffer's dtype) and
+        protects it again, reusing the storage, parity and CRC arrays: once they have grown
+        to the largest data loaded, a load allocates no per-element memory. Returns the data array.
+        """
+        data = np.asarray(data, dtype=self._storage.dtype)
+        size = data.size
+        blocks = -(-size // self.block_size)
+        if size > self._storage.size:
+            self._storage = np.empty(size, dtype=self._storage.dtype)
+        if blocks > len(self._parity_storage):
+            self._parity_storage = np.empty((blocks, self.nsym), dtype=np.uint8)
+            self._crc = array('I', bytes(4 * blocks))
+            self._verified = bytearray(blocks)
+        if self._work is None:
+            self._work = ParityWorkspace()
+        self._flat = self._storage[:size]
+        self.data = self._flat.reshape(data.shape)
+        np.copyto(self.data, data)
+        self.shape = self.data.shape
+        self._bytes = memoryview(self._flat).cast('B')
+        self.blocks = blocks
+        self._parity = self._codec.parity(self._bytes, out=self._parity_storage[:blocks], work=self._work)
+        for block in range(blocks):
+            self._crc[block] = zlib.crc32(self._block_bytes(block))
+        self.invalidate()
+        return self.data
+
+    def __len__(self):
+        return self._flat.size
+
+    def _block_bytes(self, block):
+        step = self.block_size * self.itemsize
+        return self._bytes[block * step:(block + 1) * step]
+
+    def _protect(self, block):
+        view = self._block_bytes(block)
+        self._crc[block] = zlib.crc32(view)
+        self._parity[block] = self._codec.parity(view)[0]
+
+    def _verify(self, block):
+        view = self._block_bytes(block)
+        self.checks += 1
+        if zlib.crc32(view) != self._crc[block]:
+            try:
+                decoded, corrected = self._codec.decode_chunk(bytes(view) + self._parity[block].tobytes())
+            except ReedSolomonError:
+                logging.error(f"Soft error detected in block {block}, unable to correct.")
+                raise
+            if corrected:
+                view[:] = decoded
+                self.repairs += 1
+                logging.warning(f"Soft error corrected in block {block}.")
+            # data agrees with its parity: either it was repaired or the CRC itself was hit
+            self._crc[block] = zlib.crc32(view)
+        self._verified[block] = 1
+
+    def read(self, index):
+        """Returns the element at a flat index, verifying its block if needed."""
+        block = index // self.block_size
+        if not self._verified[block]:
+            self._verify(block)
+        return self._flat[index]
+
+    def get(self, row, col):
+        """Returns the element at (row, col) of a 2-D buffer."""
+        return self.read(row * self.shape[1] + col)
+
+    def write(self, index, value):
+        """Writes the element at a flat index and re-protects its block."""
+        block = index // self.block_size
+        if not self._verified[block]:
+            self._verify(block)  # do not fold an existing error into the new parity
+        self._flat[index] = value
+        self._protect(block)
+        self._verified[block] = 0
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            return self.get(*index)
+        return self.read(index)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, tuple):
+            index = index[0] * self.shape[1] + index[1]
+        self.write(index, value)
+
+    @property
+    def value(self):
+        """Verified value of a one-element (scalar) buffer, as a Python number."""
+        return self.read(0).item()
+
+    def verify_all(self):
+        """Verifies every block that is not cached yet and returns the data array."""
+        verified = self._verified
+        for block in range(self.blocks):
+            if not verified[block]:
+                self._verify(block)
+        return self.data
+
+    def invalidate(self):
+        """Drops the verification cache so every block is checked again on its next read."""
+        np.frombuffer(self._verified, dtype=np.uint8)[:] = 0
@@ -42,6 +42,8 @@ def get_beep_level_without_fault_tolerance(distances, levels):
 # **DATA REDUNDANCY** - guardar valores passados
 import statistics
 import random
+from beeplevels import level_table
+from outliers import reject_outliers
 
 # Filtro de Kalman para suavizar leituras dos sensores
 class KalmanFilter:
@@ -122,16 +124,14 @@ def get_beep_level_with_fault_tolerance(sensors, levels):
 
     # **OUTLIER DETECTION** - Verificar alterações bruscas
     max_change = 50  # Limite de mudança aceitável em 10 ms
-    valid_distances = [
-        dist for dist in smoothed_distances if abs(dist - statistics.median(smoothed_distances)) <= max_change
-    ]
+    valid_distances = reject_outliers(smoothed_distances, max_change)  # mediana calculada uma só vez
 
     if len(valid_distances) < len(smoothed_distances) // 2:
         return -1  # Dados insuficientes após filtragem
 
     # Escolher a menor distância válida para determinar o nível de beep
     min_distance = min(valid_distances)
-    beep_level = next((i for i, level in reversed(list(enumerate(levels))) if level <= min_distance), 0)
+    beep_level = level_table(levels, "floor").lookup(min_distance)
     return beep_level
 
 def simulate_reverse_drive():
@@ -2,42 +2,178 @@ import logging
 # import hashlib
 from reedsolo import RSCodec, ReedSolomonError  # Import Reed-Solomon library
 import ast
+import os
+import array
+import struct
+import sys
 import numpy as np
 import threading
+import weakref
+from itertools import chain
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from multiprocessing import shared_memory
+from collections import namedtuple
+from contextlib import contextmanager
+import labeling
+from protectedbuffer import ProtectedBuffer
+from chunkedrs import ChunkedRSCodec
+from statestore import StateStore
+from resultcache import ResultCache, frame_pixels
+from integrity import checksum_bytes
+
+# Outcome of a watchdog call
+CALL_OK = "ok"
+CALL_ERROR = "error"
+CALL_TIMEOUT = "timeout"
+CALL_REJECTED = "rejected"
+
+
+class WatchdogPool:
+    """
+    Persistent pool of worker threads shared by WatchdogTimer instances.
+
+    Calls run as futures on reused threads. At most 'max_pending' calls can be queued
+    or running at once; further calls are rejected straight away. A call that misses
+    its deadline is abandoned: Python threads cannot be killed, so its worker keeps
+    running it and is counted as stuck until it returns.
+    """
+
+    def __init__(self, workers=4, max_pending=32):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="watchdog")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.abandoned = 0  # calls that timed out (total)
+        self.stuck = 0  # abandoned calls still running
+        self.rejected = 0  # calls refused because the queue was full
+
+    def _release(self, future):
+        self._slots.release()
+
+    def _unstuck(self, future):
+        with self._lock:
+            self.stuck -= 1
+
+    def call(self, func, args, timeout):
+        """
+        Runs func(*args) on the pool and returns (status, value), where status is one of
+        CALL_OK, CALL_ERROR, CALL_TIMEOUT or CALL_REJECTED (value is None unless CALL_OK).
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            logging.error("Watchdog queue full: call rejected.")
+            return CALL_REJECTED, None
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(self._release)
+        try:
+            return CALL_OK, future.result(timeout)  # Wait for completion up to timeout
+        except FuturesTimeoutError:
+            if not future.cancel():  # already running: the worker is stuck until it returns
+                with self._lock:
+                    self.abandoned += 1
+                    self.stuck += 1
+                future.add_done_callback(self._unstuck)
+            else:
+                with self._lock:
+                    self.abandoned += 1
+            logging.error("Watchdog timeout: Function took too long.")
+            return CALL_TIMEOUT, None
+        except Exception as e:
+            logging.error(f"Watchdog detected error: {e}")
+            return CALL_ERROR, None
+
+    def run(self, func, args, timeout, fallback_value):
+        """Runs func(*args) on the pool. Returns its result, or fallback_value on error, timeout or full queue."""
+        status, value = self.call(func, args, timeout)
+        if status != CALL_OK:
+            return fallback_value  # Fault isolation / degraded functionality
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "abandoned": self.abandoned, "stuck": self.stuck, "rejected": self.rejected}
+
+
+_default_watchdog_pool = None
+_default_watchdog_pool_lock = threading.Lock()
+
+
+def get_watchdog_pool():
+    """Returns the process-wide WatchdogPool, created on first use."""
+    global _default_watchdog_pool
+    with _default_watchdog_pool_lock:
+        if _default_watchdog_pool is None:
+            _default_watchdog_pool = WatchdogPool()
+        return _default_watchdog_pool
+
 
 class WatchdogTimer:
-    def __init__(self, timeout, fallback_value):
+    def __init__(self, timeout, fallback_value, pool=None):
         self.timeout = timeout
         self.fallback_value = fallback_value
-        self.timer = None
+        self.pool = pool
 
     def start(self, func, *args):
         """
-        Runs a function with a timeout. Returns function result or fallback value if timeout occurs.
+        Runs a function with a timeout on the watchdog worker pool.
+        Returns function result or fallback value if timeout occurs.
         """
-        result = [self.fallback_value]  # Default to fallback if timeout occurs
+        pool = self.pool or get_watchdog_pool()
+        return pool.run(func, args, self.timeout, self.fallback_value)
 
-        def wrapper():
-            try:
-                result[0] = func(*args)
-            except Exception as e:
-                logging.error(f"Watchdog detected error: {e}")
-                result[0] = self.fallback_value  # Fault isolation: use fallback
+    def call(self, func, *args):
+        """Like start, but returns (status, value) so timeouts and errors can be told apart."""
+        pool = self.pool or get_watchdog_pool()
+        return pool.call(func, args, self.timeout)
 
-        thread = threading.Thread(target=wrapper)
-        thread.start()
-        thread.join(self.timeout)  # Wait for completion up to timeout
 
-        if thread.is_alive():
-            logging.error("Watchdog timeout: Function took too long.")
-            return self.fallback_value  # Return degraded functionality
+# Backends available to count_objects_without_fault_tolerance
+COUNT_BACKENDS = ("python", "numpy")
+
+
+def count_objects_numpy(image, width, height, threshold):
+    '''
+    Vectorized object counting over a 2-D numpy.ndarray (lists are converted).
 
-        return result[0]
+    The threshold mask is built in one step and its 4-connected components are
+    labeled with a run-length two-pass union-find (see labeling.py).
 
+    Input Parameters:
+        image = Array with shape (height, width) (ndarray or list of lists of floats)
+        width = Width of the image (int)
+        height = Height of the image (int)
+        threshold = Threshold value to detect objects (float)
+    '''
+    pixels = np.asarray(image, dtype=np.float64).reshape(height, width)
+    return labeling.count_components(pixels > threshold)
+
+
+def count_objects_stream(rows, threshold, width=None):
+    '''
+    Counts objects of an image delivered row by row (e.g. straight from the camera
+    interface), keeping only the previous row's runs: memory is O(width), and the
+    work on each row is done as soon as it arrives.
+
+    Input Parameters:
+        rows = Iterable of rows (lists of floats or 1-D ndarrays)
+        threshold = Threshold value to detect objects (float)
+        width = Expected row width (int, default: width of the first row)
+    Returns -1 if a row is malformed.
+    '''
+    counter = labeling.StreamingCounter(threshold, width)
+    try:
+        for row in rows:
+            counter.push(row)
+    except (ValueError, TypeError) as e:
+        logging.error(f"Invalid row in image stream: {e}")
+        return -1
+    return counter.finish()
 
-parameters_rs = np.empty(4, dtype=object)
 
-def count_objects_without_fault_tolerance(image, width, height, threshold):
+def count_objects_without_fault_tolerance(image, width, height, threshold, backend="python"):
     '''
     Fault-tolerant object counting in an image matrix.
 
@@ -46,7 +182,13 @@ def count_objects_without_fault_tolerance(image, width, height, threshold):
         width = Width of the image (int)
         height = Height of the image (int)
         threshold = Threshold value to detect objects (float)
+        backend = "python" (BFS over lists) or "numpy" (count_objects_numpy)
     '''
+    if backend == "numpy":
+        return count_objects_numpy(image, width, height, threshold)
+    if backend != "python":
+        raise ValueError(f"Unknown backend '{backend}', expected one of {COUNT_BACKENDS}")
+
     def bfs(x, y):
 
         queue = [(x, y)]
@@ -73,66 +215,436 @@ def count_objects_without_fault_tolerance(image, width, height, threshold):
     return object_count
 
 
-def tmr_safe_execution(func, timeout,fallback_value, *args):
+class VoteResult(namedtuple("VoteResult", "value agreed disagreed failed timed_out skipped")):
     """
-        Executes a function 3 times under watchdog monitoring and returns the majority result.
-        If all executions fail, it returns the fallback value.
+    Outcome of an N-modular redundant execution.
+
+    value = Voted result (fallback value if no replica produced a valid one)
+    agreed = Replicas that returned the voted value
+    disagreed = Replicas that returned a different valid value
+    failed = Replicas that raised, were rejected or returned the fallback value
+    timed_out = Replicas that missed the deadline
+    skipped = Replicas not waited for because the vote was already decided
+    """
+
+
+class StreamingVoter:
+    """
+    Majority voter fed one replica result at a time.
+
+    The vote is decided as soon as 'quorum' replicas agree on a valid value, so the
+    remaining replicas can be cancelled or ignored. If every replica has reported and
+    no value reached the quorum, the most common valid value wins (as the plain TMR vote did).
+    """
+
+    def __init__(self, replicas=3, quorum=None, fallback_value=-1):
+        self.replicas = replicas
+        self.quorum = quorum or replicas // 2 + 1
+        if not 0 < self.quorum <= replicas:
+            raise ValueError(f"quorum must be between 1 and {replicas}")
+        self.fallback_value = fallback_value
+        self.votes = {}  # valid value -> replicas that returned it
+        self.order = []  # valid values in arrival order, for ties
+        self.failed = []
+        self.timed_out = []
+        self.decided = None
+
+    def add(self, replica, status, value=None):
+        """Records the outcome of one replica. Returns True once the vote is decided."""
+        if status == CALL_TIMEOUT:
+            self.timed_out.append(replica)
+        elif status != CALL_OK or value == self.fallback_value:
+            self.failed.append(replica)
+        else:
+            if value not in self.votes:
+                self.votes[value] = []
+                self.order.append(value)
+            self.votes[value].append(replica)
+            if self.decided is None and len(self.votes[value]) >= self.quorum:
+                self.decided = value
+        return self.decided is not None
+
+    def result(self):
+        reported = set(self.failed) | set(self.timed_out)
+        for voters in self.votes.values():
+            reported.update(voters)
+        skipped = [r for r in range(self.replicas) if r not in reported]
+        if self.decided is not None:
+            value = self.decided
+        elif self.votes:
+            value = max(self.order, key=lambda v: len(self.votes[v]))  # Majority vote
+        else:
+            logging.error("All executions failed. Using degraded functionality.")
+            return VoteResult(self.fallback_value, [], [], self.failed, self.timed_out, skipped)  # Graceful degradation
+        agreed = self.votes[value]
+        disagreed = sorted(r for v, voters in self.votes.items() if v != value for r in voters)
+        return VoteResult(value, agreed, disagreed, self.failed, self.timed_out, skipped)
+
+
+# Execution modes of nmr_safe_execution / tmr_safe_execution
+TMR_MODES = ("sequential", "process")
+
+_replica_pools = {}  # workers -> ReplicaPool handed to new callers
+_replica_pool_lock = threading.Lock()
+# replicas that missed their deadline (total), those still running, and workers killed to stop them
+replica_pool_stats = {"abandoned": 0, "stuck": 0, "terminated": 0}
+
+
+def _noop():
+    return None
+
+
+def _init_replica_worker():
+    """Forked workers must not reuse the parent's pools: their threads do not exist in the child."""
+    global _default_watchdog_pool, _replica_pools, _replica_pool_lock
+    _default_watchdog_pool = None
+    _replica_pools = {}
+    _replica_pool_lock = threading.Lock()
+
+
+class ReplicaPool:
+    """
+    Process pool with a fixed number of workers, shared by every caller that asked for
+    that many (TMR process mode, count_objects_batch, count_objects_tiled).
+
+    Callers lease it with lease_replica_pool. A pool is never shut down under a caller:
+    once retired (a worker died, or a replica missed its deadline) new leases get a fresh
+    pool, and the retired one is shut down when its last user returns it. Unlike the
+    watchdog's threads, a stuck replica's process can be killed: a pool with stuck
+    replicas has its workers terminated when it is shut down.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"),
+                                            initializer=_init_replica_worker)
+        self.users = 0
+        self.retired = False
+        self.stuck = 0  # abandoned replicas still running in this pool
+        # start every worker now so no replica pays for the fork
+        for future in [self.executor.submit(_noop) for _ in range(workers)]:
+            future.result()
+
+    def submit(self, func, *args):
+        try:
+            return self.executor.submit(func, *args)
+        except BrokenProcessPool:
+            _retire_replica_pool(self)
+            raise
+
+    def abandon(self, futures):
         """
-    watchdog = WatchdogTimer(timeout, fallback_value)
-    results = [watchdog.start(func, *args) for _ in range(3)]
+        Gives up on the futures that missed their deadline: queued ones are cancelled; a
+        running one leaves its worker stuck, so the pool is retired and, once no caller
+        uses it, its workers are terminated.
+        """
+        stuck = sum(1 for future in futures if not future.cancel() and not future.done())
+        with _replica_pool_lock:
+            replica_pool_stats["abandoned"] += len(futures)
+            replica_pool_stats["stuck"] += stuck
+            self.stuck += stuck
+        if stuck:
+            logging.error(f"Watchdog timeout: {stuck} replica process(es) stuck, their pool is retired.")
+            _retire_replica_pool(self)
+
+    def close(self):
+        if self.stuck:
+            processes = list((self.executor._processes or {}).values())
+            for process in processes:
+                process.terminate()
+            with _replica_pool_lock:
+                replica_pool_stats["stuck"] -= self.stuck
+                replica_pool_stats["terminated"] += len(processes)
+            self.stuck = 0
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+@contextmanager
+def lease_replica_pool(workers=3):
+    """Yields the ReplicaPool with 'workers' processes, created (and forked) on first use."""
+    with _replica_pool_lock:
+        pool = _replica_pools.get(workers)
+        if pool is None:
+            pool = _replica_pools[workers] = ReplicaPool(workers)
+        pool.users += 1
+    try:
+        yield pool
+    finally:
+        with _replica_pool_lock:
+            pool.users -= 1
+            close = pool.retired and not pool.users
+        if close:
+            pool.close()
 
-    # Remove invalid results (fallback value) before taking the majority vote
-    valid_results = [r for r in results if r != fallback_value]
 
-    if not valid_results:
-        logging.error("All executions failed. Using degraded functionality.")
-        return fallback_value  # Graceful degradation
+def _retire_replica_pool(pool):
+    """Takes a pool out of use (e.g. broken: a worker died); the next lease forks a new one."""
+    with _replica_pool_lock:
+        if _replica_pools.get(pool.workers) is pool:
+            del _replica_pools[pool.workers]
+        pool.retired = True
 
-    return max(set(valid_results), key=valid_results.count)  # Majority vote
+
+def _attach_shared(name):
+    """
+    Attaches a pool worker to a segment created by the parent. The workers are forked and
+    share the parent's resource tracker, which already tracks the segment: unregistering it
+    here would drop the parent's registration, and the parent owns and unlinks it.
+    """
+    return shared_memory.SharedMemory(name=name)
+
+
+def _run_replica(func, shm_name, shape, dtype, args):
+    """Runs one replica in a pool worker on the array held in shared memory, passed as a read-only ndarray view."""
+    shm = _attach_shared(shm_name)
+    array_view = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array_view.flags.writeable = False  # the replicas must not change each other's input
+    try:
+        return func(array_view, *args)
+    finally:
+        del array_view  # the shared buffer cannot be closed while a view exists
+        try:
+            shm.close()
+        except BufferError:
+            pass  # a traceback still holds the view; the mapping is released with it
+
+
+def _vote_processes(func, timeout, args, voter):
+    """
+    Runs the replicas at the same time in the replica process pool and feeds the voter as
+    results arrive. A numeric ndarray first argument is sent through shared memory (only
+    its name is pickled); any other arguments are pickled. Returns False if the pool
+    cannot take the replicas, so that they run sequentially instead.
+    """
+    shared = bool(args) and isinstance(args[0], np.ndarray) and args[0].dtype.kind in "biuf" and args[0].size > 0
+    shm = shared_memory.SharedMemory(create=True, size=args[0].nbytes) if shared else None
+    try:
+        with lease_replica_pool(max(3, voter.replicas)) as pool:
+            if shared:
+                array = args[0]
+                np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+                task = (_run_replica, func, shm.name, array.shape, array.dtype.str, args[1:])
+            else:
+                task = (func,) + tuple(args)
+            try:
+                futures = {pool.submit(*task): replica for replica in range(voter.replicas)}
+            except BrokenProcessPool:
+                return False  # the pool was retired: the replicas run sequentially instead
+            try:
+                for future in as_completed(futures, timeout=timeout):
+                    try:
+                        decided = voter.add(futures[future], CALL_OK, future.result())
+                    except Exception as e:
+                        logging.error(f"Watchdog detected error: {e}")
+                        if isinstance(e, BrokenProcessPool):
+                            _retire_replica_pool(pool)
+                        decided = voter.add(futures[future], CALL_ERROR)
+                    if decided:  # quorum reached, no need to wait for the others
+                        break
+            except FuturesTimeoutError:
+                logging.error("Watchdog timeout: Function took too long.")
+                late = [future for future in futures if not future.done()]
+                for future in late:
+                    voter.add(futures[future], CALL_TIMEOUT)
+                pool.abandon(late)
+            finally:
+                for future in futures:
+                    future.cancel()  # replicas not needed after an early decision
+        return True
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()  # replicas still attached keep their mapping
+
+
+def nmr_safe_execution(func, timeout, fallback_value, *args, replicas=3, quorum=None, mode="sequential"):
+    """
+        Executes a function 'replicas' times under watchdog monitoring and votes on the results,
+        stopping as soon as 'quorum' (default: a majority) of them agree. Returns a VoteResult;
+        its value is the fallback value if all executions fail.
+
+        mode = "sequential" runs the replicas one after another on the watchdog pool;
+               "process" runs them at the same time in separate processes under one shared
+               timeout; a numeric ndarray first argument goes through shared memory, other
+               arguments (and 'func') must be picklable. A replica that misses the deadline
+               has its worker process terminated (see ReplicaPool and replica_pool_stats).
+
+        If 'func' has a 'prepare_args' attribute, it is called once with the arguments and
+        returns the arguments given to every replica (count_objects_with_fault_tolerance
+        validates and freezes its image there, instead of once per replica).
+        """
+    if mode not in TMR_MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {TMR_MODES}")
+    prepare = getattr(func, "prepare_args", None)
+    if prepare is not None:
+        args = prepare(*args)
+    voter = StreamingVoter(replicas, quorum, fallback_value)
+    if mode == "process" and _vote_processes(func, timeout, args, voter):
+        return voter.result()
+
+    watchdog = WatchdogTimer(timeout, fallback_value)
+    for replica in range(replicas):
+        status, value = watchdog.call(func, *args)
+        if voter.add(replica, status, value):
+            break
+    return voter.result()
+
+
+def tmr_safe_execution(func, timeout,fallback_value, *args, mode="sequential"):
+    """
+        Executes a function 3 times under watchdog monitoring and returns the majority result,
+        skipping the third replica when the first two agree.
+        If all executions fail, it returns the fallback value.
+        See nmr_safe_execution for 'mode' and for the detailed vote report.
+        """
+    return nmr_safe_execution(func, timeout, fallback_value, *args, mode=mode).value
 
 
 # Initialize Reed-Solomon codec (can correct up to 4 symbol errors)
 rs = RSCodec(10)
 
+# Binary payload format: one type tag byte followed by the packed value
+TAG_NONE = ord('n')
+TAG_BOOL = ord('?')
+TAG_INT = ord('q')  # int64
+TAG_FLOAT = ord('d')  # float64
+TAG_MATRIX = ord('M')  # list of lists of floats: rows, cols (uint32) + float64 values
+TAG_ARRAY = ord('A')  # float64 ndarray: ndim (uint8), shape (uint32 each) + values
+TAG_TEXT = ord('s')  # utf-8 string
+TAG_LITERAL = ord('r')  # anything else: repr(), parsed back with ast.literal_eval
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _is_float_matrix(data):
+    if not data or not all(type(row) is list for row in data):
+        return False
+    cols = len(data[0])
+    return all(len(row) == cols for row in data) and all(type(v) is float for row in data for v in row)
+
+
+def pack_value(data):
+    """Packs a value into a tagged binary payload (bytearray) without going through str()."""
+    kind = type(data)
+    if data is None:
+        return bytearray((TAG_NONE,))
+    if kind is bool:
+        return bytearray((TAG_BOOL, data))
+    if isinstance(data, (int, np.integer)) and kind is not np.bool_ and INT64_MIN <= data <= INT64_MAX:
+        payload = bytearray(9)
+        payload[0] = TAG_INT
+        struct.pack_into('<q', payload, 1, int(data))
+        return payload
+    if isinstance(data, (float, np.floating)):  # NumPy scalars too: their repr is not a literal
+        payload = bytearray(9)
+        payload[0] = TAG_FLOAT
+        struct.pack_into('<d', payload, 1, float(data))
+        return payload
+    if kind is np.ndarray and data.dtype == np.float64:
+        values = np.ascontiguousarray(data, dtype='<f8')
+        payload = bytearray(struct.pack(f'<BB{values.ndim}I', TAG_ARRAY, values.ndim, *values.shape))
+        if values.size:  # an empty array has no bytes (and memoryview cannot cast it)
+            payload += memoryview(values).cast('B')
+        return payload
+    if kind is list and _is_float_matrix(data):
+        payload = bytearray(struct.pack('<BII', TAG_MATRIX, len(data), len(data[0])))
+        values = array.array('d')
+        for row in data:
+            values.extend(row)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        payload += memoryview(values).cast('B')
+        return payload
+    if kind is str:
+        return bytearray((TAG_TEXT,)) + data.encode('utf-8')
+    return bytearray((TAG_LITERAL,)) + repr(data).encode('utf-8')
+
+
+def unpack_value(payload):
+    """Inverse of pack_value. Raises ValueError if the payload is not a valid tagged value."""
+    view = memoryview(payload)
+    if not len(view):
+        raise ValueError("Empty payload")
+    tag = view[0]
+    if tag == TAG_NONE:
+        return None
+    if tag == TAG_BOOL:
+        return bool(view[1])
+    if tag == TAG_INT:
+        return struct.unpack_from('<q', view, 1)[0]
+    if tag == TAG_FLOAT:
+        return struct.unpack_from('<d', view, 1)[0]
+    if tag == TAG_MATRIX:
+        rows, cols = struct.unpack_from('<II', view, 1)
+        values = np.frombuffer(view, dtype='<f8', count=rows * cols, offset=9)
+        return values.reshape(rows, cols).tolist()
+    if tag == TAG_ARRAY:
+        ndim = view[1]
+        shape = struct.unpack_from(f'<{ndim}I', view, 2)
+        count = int(np.prod(shape)) if ndim else 1
+        values = np.frombuffer(view, dtype='<f8', count=count, offset=2 + 4 * ndim)
+        return values.astype(np.float64).reshape(shape)
+    if tag == TAG_TEXT:
+        return str(view[1:], 'utf-8')
+    if tag == TAG_LITERAL:
+        try:
+            return ast.literal_eval(str(view[1:], 'utf-8'))
+        except (ValueError, SyntaxError) as e:
+            raise ValueError(f"Invalid literal payload: {e}")
+    raise ValueError(f"Unknown payload tag {tag}")
+
+
 def encode_rs(data):
     """Encodes data using Reed-Solomon for error correction."""
-    return rs.encode(bytearray(str(data), 'utf-8'))
+    return rs.encode(pack_value(data))
+
 
+# Chunked RS settings per protected field: parity bytes and message bytes per codeword.
+# Image blocks hold 30 float64 pixels; the scalars fit in one small codeword each.
+RS_FIELDS = {
+    "image": ChunkedRSCodec(nsym=10, chunk_size=240),
+    "width": ChunkedRSCodec(nsym=8, chunk_size=8),
+    "height": ChunkedRSCodec(nsym=8, chunk_size=8),
+    "threshold": ChunkedRSCodec(nsym=8, chunk_size=8),
+}
 
-# Store last known good values for fallback
-last_valid_values = {}
 
+# Store last known good values for fallback, per (stream, parameter)
+last_valid_values = StateStore()
 
-def decode_rs(encoded_data, param_name):
-    """Decodes and corrects data using Reed-Solomon."""
+
+def decode_rs(encoded_data, param_name, stream=0):
+    """Decodes and corrects data using Reed-Solomon. Returns the decoded value."""
+    state = last_valid_values[stream, param_name]
     try:
         decoded_bytes = rs.decode(encoded_data)
         if isinstance(decoded_bytes, tuple):
             decoded_bytes = decoded_bytes[0]  # Extract actual corrected data
-        result = decoded_bytes.decode('utf-8')
+        result = unpack_value(decoded_bytes)
 
         # Store last valid value for fallback
-        last_valid_values[param_name] = result
-        return result
+        return state.remember(result)
 
     except ReedSolomonError:
         logging.error(f"Soft error detected in '{param_name}', unable to correct.")
 
         # Fault Isolation: Use last valid value instead of returning None
-        if param_name in last_valid_values:
+        fallback = state.recall()
+        if fallback is not None:
             logging.warning(f"Using last known good value for '{param_name}'.")
-            return last_valid_values[param_name]
+            return fallback
 
         return None  # Graceful Degradation: No valid fallback
 
-def compare_rs(data,encoded_data,param_name):
-    b = decode_rs(encoded_data,param_name)
+def compare_rs(data,encoded_data,param_name,stream=0):
     try:
-        b = ast.literal_eval(str(b))  # Ensure it is correctly parsed as a Python object
-    except (ValueError, SyntaxError):
+        b = decode_rs(encoded_data,param_name,stream)
+    except (ValueError, struct.error):
         logging.error(f"Failed to evaluate decoded data for {param_name}, using original.")
         return data
 
+    if isinstance(b, np.ndarray) or isinstance(data, np.ndarray):
+        return data if np.array_equal(b, data) else b
     if b == data:
         return data
     else:
@@ -144,29 +656,159 @@ logging.basicConfig(level=logging.ERROR, format="%(asctime)s - %(levelname)s - %
 
 
 
-def count_objects_with_fault_tolerance(image, width, height, threshold):
+# Validation errors of count_objects_with_fault_tolerance (each one returns -1)
+INVALID_FORMAT = "Invalid image format: Image must be a list of lists."
+EMPTY_IMAGE = "Invalid image data: Image is empty."
+INVALID_VALUES = "Invalid image data: All values must be positive integers or floats."
+DIMENSION_MISMATCH = "Dimension mismatch: Provided width/height do not match image structure."
+
+# Read-only arrays that already passed validate_image: id -> (weakref, width, height)
+_validated = {}
+
+
+def _remember_valid(pixels, width, height):
+    """'pixels' must be a private array (no one else holds a reference to it)."""
+    pixels.flags.writeable = False
+    view = pixels.view()  # the base is read-only too, so nobody can change a validated frame
+    key = id(view)
+    _validated[key] = (weakref.ref(view, lambda _, key=key: _validated.pop(key, None)), width, height)
+    return view
+
+
+def validate_image(image, width, height, into=None):
+    """
+    Validates an image for count_objects_with_fault_tolerance with the same rules and
+    error messages as the original per-pixel checks, without a Python pass per pixel.
+
+    A 2-D float ndarray costs O(1) dtype/shape checks plus one vectorized min; a list
+    of lists is type-checked with set(map(type, ...)) and converted in one np.array
+    call. Returns (pixels, None), where pixels is a read-only float ndarray that later
+    calls accept in O(1), or (None, error message). The caller's ndarray is copied
+    before its values are checked: a cached array must not share memory with an array
+    that can still be written.
+
+    into = ProtectedBuffer to copy the pixels into (with ProtectedBuffer.load) instead of
+           a new read-only array; pixels is then its data, which is not remembered
+    """
+    if isinstance(image, np.ndarray):
+        entry = _validated.get(id(image))
+        if entry is not None and entry[0]() is image and entry[1:] == (width, height):
+            # already validated (e.g. by prepare_image before a TMR vote)
+            return (image if into is None else into.load(image)), None
+        if image.ndim != 2 or image.dtype.kind != 'f':
+            return None, INVALID_FORMAT
+        if image.shape[0] == 0:
+            return None, EMPTY_IMAGE
+        # private copy, checked and then frozen (or kept in the caller's buffer)
+        pixels = np.array(image, dtype=np.float64) if into is None else into.load(image)
+        if pixels.size and not pixels.min() >= 0:  # NaN fails too, as 'val >= 0' did
+            return None, INVALID_VALUES
+        if pixels.shape != (height, width):
+            return None, DIMENSION_MISMATCH
+        return (_remember_valid(pixels, width, height) if into is None else pixels), None
+
+    if not isinstance(image, list) or not all(issubclass(t, list) for t in set(map(type, image))):
+        return None, INVALID_FORMAT
+    if not image:
+        return None, EMPTY_IMAGE
+    if not all(issubclass(t, float) for t in set(map(type, chain.from_iterable(image)))):
+        return None, INVALID_VALUES
+    if len(set(map(len, image))) != 1:  # ragged rows cannot be converted: check the values row by row
+        if not all(val >= 0 for row in image for val in row):
+            return None, INVALID_VALUES
+        return None, DIMENSION_MISMATCH
+    pixels = np.array(image, dtype=np.float64)
+    if pixels.size and not pixels.min() >= 0:
+        return None, INVALID_VALUES
+    if pixels.shape != (height, width):
+        return None, DIMENSION_MISMATCH
+    return (_remember_valid(pixels, width, height) if into is None else into.load(pixels)), None
+
+
+class BfsScratch:
+    """
+    Buffers reused by every count_objects_with_fault_tolerance call on one thread, so a
+    frame only allocates its result (they grow, never shrink, with the largest frame).
+
+    pending = uint8 per pixel: 1 for an object pixel not visited yet (the visited array)
+    queue = int32 ring buffer of flat pixel indices for the BFS
+    image_rs, width_rs, height_rs, threshold_rs = ProtectedBuffers the parameters are
+        loaded into (ProtectedBuffer.load), keeping their storage, parity and CRCs
+    """
+
+    def __init__(self):
+        self.pending = bytearray()
+        self.queue = array.array('i')
+        self.pending_view = np.empty(0, dtype=bool)
+        self.image_rs = ProtectedBuffer(np.empty(0), codec=RS_FIELDS["image"])
+        self.width_rs = ProtectedBuffer(0, dtype=np.int64, codec=RS_FIELDS["width"])
+        self.height_rs = ProtectedBuffer(0, dtype=np.int64, codec=RS_FIELDS["height"])
+        self.threshold_rs = ProtectedBuffer(0.0, codec=RS_FIELDS["threshold"])
+
+    def reserve(self, size):
+        if size <= len(self.pending):
+            return
+        self.pending = bytearray(size)
+        self.queue = array.array('i', bytes(4 * max(size, 1)))
+        self.pending_view = np.frombuffer(self.pending, dtype=bool)
+
+    def fill(self, start, width, size):
+        """BFS from flat index 'start' over 4-connected pending pixels, marking them visited; returns the object's size."""
+        pending, queue = self.pending, self.queue
+        capacity = len(queue)
+        pending[start] = 0
+        queue[0] = start
+        head, tail, filled = 0, 1, 1
+        while head != tail:
+            p = queue[head]
+            head = head + 1 if head + 1 < capacity else 0
+            col = p % width
+            for q in (p - width if p >= width else -1, p + width if p + width < size else -1,
+                      p - 1 if col else -1, p + 1 if col + 1 < width else -1):
+                if q >= 0 and pending[q]:
+                    pending[q] = 0
+                    queue[tail] = q
+                    tail = tail + 1 if tail + 1 < capacity else 0
+                    filled += 1
+        return filled
+
+
+_bfs_scratch = threading.local()
+
+
+def get_bfs_scratch():
+    """Returns this thread's BfsScratch (replicas on different watchdog threads never share one)."""
+    scratch = getattr(_bfs_scratch, "buffers", None)
+    if scratch is None:
+        scratch = _bfs_scratch.buffers = BfsScratch()
+    return scratch
+
+
+def prepare_image(image, width, height):
+    """
+    Validates an image once before it is handed to several replicas: returns the
+    validated read-only ndarray, which each replica accepts in O(1), or the image
+    unchanged if it is invalid (so every replica reports the error as before).
+    """
+    pixels, error = validate_image(image, width, height)
+    return image if error else pixels
+
+
+def count_objects_with_fault_tolerance(image, width, height, threshold, stream=0):
 
     '''
     Input Parameters:
-        image = Matrix with dimensions 'width' and 'height' (list with lists of floats)
+        image = Matrix with dimensions 'width' and 'height' (list with lists of floats, or 2-D float ndarray)
         width = Width of the image (int)
         height = Height of the image (int)
         threshold = Threshold value to detect objects (float)
+        stream = Id of the camera / stream (any hashable), which keeps its own last valid values
     '''
-    if not isinstance(image, list) or not all(isinstance(row, list) for row in image):
-        logging.error("Invalid image format: Image must be a list of lists.")
-        return -1
-
-    if not len(image) > 0:
-        logging.error("Invalid image data: Image is empty.")
-        return -1
-
-    if not all(isinstance(val, float) and val >= 0 for row in image for val in row):
-        logging.error("Invalid image data: All values must be positive integers or floats.")
-        return -1
-
-    if len(image) != height or any(len(row) != width for row in image):
-        logging.error("Dimension mismatch: Provided width/height do not match image structure.")
+    scratch = get_bfs_scratch()
+    # the frame is copied into this thread's protected image buffer and checked there
+    error = validate_image(image, width, height, into=scratch.image_rs)[1]
+    if error:
+        logging.error(error)
         return -1
 
     if not isinstance(threshold, float):
@@ -176,70 +818,258 @@ def count_objects_with_fault_tolerance(image, width, height, threshold):
     # # Ensure successful recovery, else return failure state
     # if None in (image, width, height, threshold):
     #     return -1
-    # Encode parameters using RS codes
-    parameters_rs[0] = encode_rs(image)
-    parameters_rs[1] = encode_rs(width)
-    parameters_rs[2] = encode_rs(height)
-    parameters_rs[3] = encode_rs(threshold)
+    # Protect parameters with per-block CRC + RS parity; each block is checked once, on first read
+    # (reused buffers of this thread: concurrent replicas and callers never share them)
+    image_rs = scratch.image_rs
+    width_rs, height_rs, threshold_rs = scratch.width_rs, scratch.height_rs, scratch.threshold_rs
+    width_rs.load(width)
+    height_rs.load(height)
+    threshold_rs.load(threshold)
+
+    try:
+        width, height = width_rs.value, height_rs.value
+        size = width * height
+        scratch.reserve(size)
+        # pending[p] = 1 for object pixels not visited yet: it is the visited array, inverted
+        pending = scratch.pending
+        np.greater(image_rs.verify_all().reshape(-1), threshold_rs.value, out=scratch.pending_view[:size])
+    except Exception as e:
+        logging.error(f"Unexpected error in count_objects: {e}")
+        return -1  # Graceful Degradation
 
-    visited = set()
     object_count = 0
     object_count_rs = encode_rs(object_count)
+    try:
+        start = pending.find(1, 0, size)
+        while start != -1:
+            object_count = compare_rs(object_count, object_count_rs, "object_count", stream)
+            object_count += 1
+            object_count_rs = encode_rs(object_count)
+            try:
+                scratch.fill(start, width, size)
+            except Exception as e:
+                logging.error(f"Error during BFS traversal: {e}")  # Fault Isolation: if bfs crashes, it's only the function, not the whole process
+            start = pending.find(1, start + 1, size)
 
-    def bfs(x, y,visited_rs):
-        try:
-            queue = [(x, y)]
-            # queue_rs= encode_rs(queue)
+        return object_count
+    except Exception as e:
+        logging.error(f"Unexpected error in count_objects: {e}")
+        return -1  # Graceful Degradation
 
 
-            # visited_temp = compare_rs(visited,visited_rs,"visited")
-            # visited.clear()
-            # visited.union(visited_temp)
-            visited.add((x, y))
-            # visited_rs = encode_rs(visited)
+def _prepare_count_args(*args):
+    """Validates the image of a TMR vote once, before its replicas (see nmr_safe_execution)."""
+    if len(args) < 3:
+        return args  # wrong arguments: every replica reports them as before
+    image, width, height = args[:3]
+    return (prepare_image(image, width, height),) + args[1:]
 
-            while queue:
-                # queue = compare_rs(queue, queue_rs, "queue")
-                cx, cy = queue.pop(0)
-                # queue_rs = encode_rs(queue)
 
-                for dx, dy in [(0, 1), (1, 0), (-1, 0), (0, -1)]:
-                    nx, ny = cx + dx, cy + dy
+count_objects_with_fault_tolerance.prepare_args = _prepare_count_args
 
-                    if (0 <= nx < compare_rs(height,parameters_rs[2],"height")
-                            and 0 <= ny < compare_rs(width,parameters_rs[1],"width")
-                            and (nx, ny) not in visited
-                            and compare_rs(image,parameters_rs[0],"image")[nx][ny] > compare_rs(threshold,parameters_rs[3],"threshold") ):
 
-                        # queue = compare_rs(queue, queue_rs, "queue")
-                        queue.append((nx, ny))
-                        # queue_rs = encode_rs(queue)
+def _count_frame(func, shm_name, offset, shape, threshold, timeout, fallback_value, replicas, stream):
+    """Runs the TMR vote for one frame of a batch in a pool worker; the frame is read from shared memory."""
+    height, width = shape
+    shm = _attach_shared(shm_name)
+    try:
+        frame = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, offset=offset)
+        # validated into a private frozen copy: a replica abandoned by the watchdog may outlive this call
+        pixels, error = validate_image(frame, width, height)
+        if error:
+            pixels = np.array(frame)
+        del frame
+    finally:
+        shm.close()
+    return nmr_safe_execution(func, timeout, fallback_value, pixels, width, height, threshold, stream,
+                              replicas=replicas).value
+
+
+def count_objects_batch(frames, threshold, workers=None, timeout=2, fallback_value=-1, replicas=3,
+                        func=None, stream=0):
+    '''
+    Counts the objects of many frames on the persistent replica process pool.
 
-                        # visited_temp = compare_rs(visited, visited_rs, "visited")
-                        # visited.clear()
-                        # visited.union(visited_temp)
-                        visited.add((nx, ny))
-                        # visited_rs = encode_rs(visited)
+    All frames are copied once into one shared memory segment; each worker reads its
+    frame from there (only the segment name and offsets are pickled) and runs the usual
+    watchdog-guarded TMR vote on it. Results are returned in input order.
+
+    Input Parameters:
+        frames = Sequence of images (lists of lists of floats or 2-D ndarrays)
+        threshold = Threshold value to detect objects (float)
+        workers = Number of worker processes (default: one per CPU)
+        timeout, fallback_value, replicas = As in nmr_safe_execution, per frame
+        func = Counting function, called as func(image, width, height, threshold, stream)
+               (default: count_objects_with_fault_tolerance)
+        stream = Id of the camera / stream the frames come from
+    '''
+    func = func or count_objects_with_fault_tolerance
+    results = [fallback_value] * len(frames)
+    shared, offsets, nbytes = [], [], 0
+    for index, image in enumerate(frames):
+        if isinstance(image, np.ndarray) and image.ndim == 2:
+            height, width = image.shape
+        else:
+            height = len(image) if isinstance(image, list) else 0
+            width = len(image[0]) if height and isinstance(image[0], list) else 0
+        # validated here with the counter's own rules, before anything is converted or shared
+        pixels, error = validate_image(image, width, height)
+        if error:
+            # the counter reports the error under the usual TMR vote (fallback_value)
+            results[index] = tmr_safe_execution(func, timeout, fallback_value, image, width, height, threshold, stream)
+            continue
+        shared.append((index, pixels))
+        offsets.append(nbytes)
+        nbytes += pixels.nbytes
+    if not shared:
+        return results
+
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    try:
+        for (index, pixels), offset in zip(shared, offsets):
+            np.ndarray(pixels.shape, dtype=np.float64, buffer=shm.buf, offset=offset)[:] = pixels
+        pending = list(zip(shared, offsets))
+        for attempt in range(2):
+            with lease_replica_pool(workers or os.cpu_count() or 1) as pool:
+                futures = []
+                for (index, pixels), offset in pending:
+                    try:
+                        future = pool.submit(_count_frame, func, shm.name, offset, pixels.shape, threshold,
+                                             timeout, fallback_value, replicas, stream)
+                    except BrokenProcessPool as e:
+                        future = Future()
+                        future.set_exception(e)
+                    futures.append((index, pixels, offset, future))
+                pending = []
+                for index, pixels, offset, future in futures:
+                    try:
+                        results[index] = future.result()
+                    except BrokenProcessPool as e:
+                        # a worker died: every unfinished frame of the pool fails with it, not only the
+                        # dead worker's; they are sent once more to a new pool, then degrade
+                        logging.error(f"Batch worker failed on frame {index}: {e}")
+                        _retire_replica_pool(pool)
+                        pending.append(((index, pixels), offset))
+                    except Exception as e:  # Fault isolation: only this frame degrades
+                        logging.error(f"Batch worker failed on frame {index}: {e}")
+            if not pending:
+                break
+        return results
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _label_strip(shm_name, shape, dtype, first_row, last_row, threshold):
+    """Labels rows first_row..last_row-1 of the image in shared memory (in a pool worker)."""
+    shm = _attach_shared(shm_name)
+    try:
+        pixels = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        mask = pixels[first_row:last_row] > threshold
+        del pixels
+        return labeling.label_strip(mask)
+    finally:
+        shm.close()
 
-        except Exception as e:
-            logging.error(f"Error during BFS traversal: {e}") # Fault Isolation: if bfs crashes, it's only the function, not the whole process
-            return -1
 
+def count_objects_tiled(image, width, height, threshold, workers=None, strip_rows=None):
+    '''
+    Counts objects of a large image by labeling horizontal strips in parallel.
+
+    The image is shared once with the replica process pool; each worker thresholds and
+    labels only its strip, so its working memory is one strip. The objects that cross a
+    strip border are then merged with a union-find pass over the border rows.
+
+    Input Parameters:
+        image = Array with shape (height, width) (ndarray or list of lists of floats)
+        width, height, threshold = As in count_objects_numpy
+        workers = Number of worker processes (default: one per CPU)
+        strip_rows = Rows per strip (default: about 4M pixels, at least one strip per worker)
+    '''
+    pixels = np.asarray(image)
+    if pixels.dtype.kind not in "fiub":
+        pixels = pixels.astype(np.float64)
+    pixels = pixels.reshape(height, width)
+    if pixels.size == 0:
+        return 0
+    workers = workers or os.cpu_count() or 1
+    if strip_rows is None:
+        strip_rows = min(-(-height // workers), max(1, (1 << 22) // width))
+    bounds = [(row, min(row + strip_rows, height)) for row in range(0, height, strip_rows)]
+
+    shm = shared_memory.SharedMemory(create=True, size=pixels.nbytes)
     try:
-        for i in range(compare_rs(height,parameters_rs[2],"height") ):
-            for j in range(compare_rs(width,parameters_rs[1],"width")):
-                visited_rs = encode_rs(visited)
-                if image[i][j] > compare_rs(threshold,parameters_rs[3],"threshold") and (i, j) not in visited:
-                    bfs(i, j, visited_rs)
+        np.ndarray(pixels.shape, dtype=pixels.dtype, buffer=shm.buf)[:] = pixels
+        with lease_replica_pool(workers) as pool:
+            futures = [pool.submit(_label_strip, shm.name, pixels.shape, pixels.dtype.str, first, last, threshold)
+                       for first, last in bounds]
+            try:
+                strips = [future.result() for future in futures]
+            except BrokenProcessPool:
+                _retire_replica_pool(pool)
+                raise
+        return labeling.merge_strips(strips)
+    finally:
+        shm.close()
+        shm.unlink()
 
-                    object_count = compare_rs(object_count,object_count_rs,"object_count")
-                    object_count += 1
-                    object_count_rs = encode_rs(object_count)
 
-        return object_count
-    except Exception as e:
-        logging.error(f"Unexpected error in count_objects: {e}")
-        return -1  # Graceful Degradation
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Returns the process-wide ResultCache, created on first use."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
+
+
+def count_objects_cached(image, width, height, threshold, fault_tolerant=True, checksum=None, cache=None,
+                         timeout=2, fallback_value=-1, stream=0):
+    '''
+    Counts objects with a result cache in front of the counter, so repeated frames
+    (static cameras) are answered without counting again.
+
+    Input Parameters:
+        image, width, height, threshold, stream = As in count_objects_with_fault_tolerance
+        fault_tolerant = True: TMR over count_objects_with_fault_tolerance; False: the plain counter
+        checksum = CRC-32 of the frame's float64 pixel buffer sent by the camera (optional); a frame
+                   that does not match is rejected: never looked up, never cached
+        cache = ResultCache to use (default: get_result_cache())
+        timeout, fallback_value = As in tmr_safe_execution
+    Fallback results (-1: invalid frame, failed counting) are never cached.
+    '''
+    if cache is None:
+        cache = get_result_cache()
+    pixels = frame_pixels(image)
+    # same threshold rule as the counter: an invalid one is never turned into a key (float("x") raises)
+    if pixels is not None and pixels.shape == (height, width) and isinstance(threshold, float):
+        if checksum is not None and checksum_bytes(memoryview(pixels).cast('B'), "crc32") != checksum:
+            logging.error("Frame integrity check failed (CRC-32 mismatch): result not cached.")
+            cache.reject()
+            return fallback_value
+        key = cache.key(pixels, threshold, "ft" if fault_tolerant else "plain")
+        value = cache.get(key)
+        if value is not None:
+            return value
+    else:
+        key = None  # not a numeric matrix of the given size, or a bad threshold: let the counter report it
+
+    if fault_tolerant:
+        value = tmr_safe_execution(count_objects_with_fault_tolerance, timeout, fallback_value,
+                                   image, width, height, threshold, stream)
+    else:
+        try:
+            value = count_objects_without_fault_tolerance(image, width, height, threshold)
+        except (IndexError, TypeError) as e:
+            logging.error(f"Plain counter failed: {e}")
+            value = fallback_value
+    if key is not None and value != fallback_value:
+        cache.put(key, value)
+    return value
 
 
 # Sample Test Cases
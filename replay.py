@@ -0,0 +1,165 @@
+import argparse
+import mmap
+import os
+import numpy as np
+from beeppipeline import BeepPipeline
+from sensorframe import frame_dtype, frames_from_buffer, make_frames
+
+# Replay de gravações de sensores (FR4) a partir de ficheiros binários.
+# Em vez de construir os casos de teste em listas (simulate_reverse_drive), o log
+# é mapeado em memória e processado em lotes de tamanho fixo pelo BeepPipeline;
+# os beep levels são escritos num segundo ficheiro mapeado. A memória usada
+# depende só do tamanho do lote, não do tamanho do log.
+#
+# Formato do log:   cabeçalho (LOG_HEADER) + frames consecutivos (sensorframe.frame_dtype)
+# Formato da saída: um int16 little-endian por frame (-1 = frame inválido)
+
+LOG_MAGIC = b"SFLG"
+LOG_VERSION = 1
+LOG_HEADER = np.dtype([("magic", "S4"), ("version", "<u2"), ("groups", "<u2")])
+LEVEL_DTYPE = np.dtype("<i2")
+
+
+def _header(groups):
+    header = np.zeros(1, dtype=LOG_HEADER)
+    header["magic"] = LOG_MAGIC
+    header["version"] = LOG_VERSION
+    header["groups"] = groups
+    return header.tobytes()
+
+
+def read_header(buffer):
+    """Devolve o número de grupos de um log; levanta ValueError se o cabeçalho for inválido."""
+    if len(buffer) < LOG_HEADER.itemsize:
+        raise ValueError("log demasiado curto para conter o cabeçalho")
+    header = np.frombuffer(buffer, dtype=LOG_HEADER, count=1)[0]
+    if header["magic"] != LOG_MAGIC or header["version"] != LOG_VERSION:
+        raise ValueError("cabeçalho de log inválido")
+    return int(header["groups"])
+
+
+def write_log(path, batches, groups):
+    """Escreve um log a partir de um iterável de lotes de frames estruturados (ou de leituras)."""
+    count = 0
+    with open(path, "wb") as f:
+        f.write(_header(groups))
+        for frames in batches:
+            if not (isinstance(frames, np.ndarray) and frames.dtype.names):
+                frames = make_frames(frames, timestamps=(count + np.arange(len(frames))) * 0.01)
+            if frames.dtype != frame_dtype(groups):
+                raise ValueError(f"dtype de frame inválido: {frames.dtype}")
+            f.write(frames.tobytes())
+            count += len(frames)
+    return count
+
+
+def reverse_drive_batches(frames, groups=3, batch=65536):
+    """
+    Gera lotes de frames de uma marcha-atrás simulada (o padrão de simulate_reverse_drive,
+    repetido até 'frames' frames): a distância desce 4 cm a cada 10 frames e os grupos
+    leem distance - 1, distance, distance + 1, ...
+    """
+    offsets = np.arange(groups) - 1
+    for start in range(0, frames, batch):
+        steps = np.arange(start, min(start + batch, frames))
+        distance = 100 - 4 * ((steps // 10) % 26 + 1)
+        readings = np.maximum(0, distance[:, None] + offsets[None, :])
+        readings = np.repeat(readings, 3, axis=1).reshape(len(steps), groups, 3)
+        yield make_frames(readings, timestamps=steps * 0.01)
+
+
+def _release(mm, start, end):
+    """Liberta as páginas já processadas de um mmap (a memória residente não cresce com o log)."""
+    if not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    start -= start % mmap.PAGESIZE
+    end -= end % mmap.PAGESIZE
+    if end > start:
+        mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+def replay(log_path, output_path, levels, batch=65536, pipeline=None):
+    """
+    Processa um log gravado em lotes de 'batch' frames e escreve um beep level por frame
+    em 'output_path'.
+
+    Parâmetros:
+        log_path (str): log binário (write_log)
+        output_path (str): ficheiro de saída, criado com o tamanho final e mapeado em memória
+        levels (list): níveis de beep
+        batch (int): frames por lote
+        pipeline (BeepPipeline): pipeline a usar (por omissão um novo, com os grupos do log)
+
+    Retorna:
+        int: número de frames processados
+    """
+    if batch <= 0:
+        raise ValueError("batch deve ser positivo")
+    with open(log_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < LOG_HEADER.itemsize:
+            raise ValueError("log demasiado curto para conter o cabeçalho")
+        src = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        groups = read_header(src)
+        dtype = frame_dtype(groups)
+        count = (size - LOG_HEADER.itemsize) // dtype.itemsize
+        if pipeline is None:
+            pipeline = BeepPipeline(list(levels), groups)
+        elif pipeline.groups != groups:
+            raise ValueError(f"o pipeline espera {pipeline.groups} grupos, o log tem {groups}")
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            src.madvise(mmap.MADV_SEQUENTIAL)
+
+        with open(output_path, "w+b") as out:
+            out.truncate(count * LEVEL_DTYPE.itemsize)
+            if count == 0:
+                return 0
+            dst = mmap.mmap(out.fileno(), count * LEVEL_DTYPE.itemsize)
+            try:
+                for start in range(0, count, batch):
+                    n = min(batch, count - start)
+                    offset = LOG_HEADER.itemsize + start * dtype.itemsize
+                    frames = frames_from_buffer(src, groups, count=n, offset=offset)
+                    result = np.frombuffer(dst, dtype=LEVEL_DTYPE, count=n, offset=start * LEVEL_DTYPE.itemsize)
+                    result[:] = pipeline.process_batch(frames)
+                    del frames, result  # o mmap só pode ser fechado sem vistas ativas
+                    _release(src, offset, offset + n * dtype.itemsize)
+                    dst.flush()
+                    _release(dst, start * LEVEL_DTYPE.itemsize, (start + n) * LEVEL_DTYPE.itemsize)
+            finally:
+                dst.close()
+        return count
+    finally:
+        src.close()
+
+
+def read_levels(path):
+    """Beep levels de um ficheiro de saída de replay (mapeado, sem ler o ficheiro todo)."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=LEVEL_DTYPE)
+    return np.memmap(path, dtype=LEVEL_DTYPE, mode="r")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay de logs binários de sensores")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="grava uma marcha-atrás simulada")
+    record.add_argument("log")
+    record.add_argument("--frames", type=int, default=1_000_000)
+    record.add_argument("--groups", type=int, default=3)
+    run = commands.add_parser("run", help="processa um log e escreve os beep levels")
+    run.add_argument("log")
+    run.add_argument("output")
+    run.add_argument("--levels", type=float, nargs="+", default=[5, 10, 20, 40, 70])
+    run.add_argument("--batch", type=int, default=65536)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        written = write_log(args.log, reverse_drive_batches(args.frames, args.groups), args.groups)
+        print(f"{written} frames gravados em {args.log}")
+    else:
+        processed = replay(args.log, args.output, args.levels, args.batch)
+        results = read_levels(args.output)
+        invalid = int(np.count_nonzero(results == -1)) if processed else 0
+        print(f"{processed} frames processados, {invalid} inválidos -> {args.output}")
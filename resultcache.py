@@ -0,0 +1,94 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# LRU cache of counting results keyed by the content of the frame.
+# Static cameras send many identical frames; the key is a BLAKE2 digest of the raw
+# pixel buffer (as float64) plus the shape, threshold and counter, so an identical frame
+# is answered without running the (triple) BFS again. The size bound is in bytes.
+
+# Approximate bytes held per entry besides the value: key tuple, digest and OrderedDict node
+ENTRY_OVERHEAD = 200
+
+
+def frame_pixels(image):
+    """Returns the frame as a C-contiguous float64 matrix, or None if it is not a numeric matrix."""
+    try:
+        pixels = np.ascontiguousarray(image, dtype=np.float64)
+    except (ValueError, TypeError):
+        return None
+    return pixels if pixels.ndim == 2 else None
+
+
+def frame_digest(pixels, digest_size=16):
+    """BLAKE2b digest of the raw buffer of a C-contiguous ndarray."""
+    return hashlib.blake2b(memoryview(pixels).cast('B'), digest_size=digest_size).digest()
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with a bound on its total size in bytes.
+
+    Input Parameters:
+        max_bytes = Maximum approximate size of all entries (int)
+    """
+
+    def __init__(self, max_bytes=1 << 20):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0  # frames not cached or served because their integrity check failed
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, pixels, threshold, tag=""):
+        """Returns the cache key of a frame given as frame_pixels() returns it."""
+        return (frame_digest(pixels), pixels.shape, float(threshold), tag)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = ENTRY_OVERHEAD + sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "rejected": self.rejected}
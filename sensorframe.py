@@ -0,0 +1,78 @@
+import numpy as np
+from integrity import record_checksums
+
+# Formato binário de frame de sensores com dtype fixo (NumPy structured array).
+# Um frame guarda as leituras dos grupos de 3 sensores, o id de cada grupo, o
+# instante de aquisição e um CRC do próprio registo. Um buffer de bytes com
+# frames consecutivos é lido sem cópia com np.frombuffer, e a validação de um
+# lote inteiro é uma verificação de dtype e não um isinstance por leitura.
+
+_dtypes = {}
+
+
+def frame_dtype(groups):
+    """dtype (little-endian, sem padding) de um frame com 'groups' grupos de 3 sensores."""
+    dtype = _dtypes.get(groups)
+    if dtype is None:
+        dtype = _dtypes[groups] = np.dtype([
+            ("timestamp", "<f8"),  # segundos
+            ("stream", "<u4"),  # id do veículo / fluxo
+            ("group_ids", "<u2", (groups,)),
+            ("readings", "<f4", (groups, 3)),  # distâncias em cm
+            ("crc", "<u4"),  # CRC (integrity.py, CRC-32 por omissão) dos bytes anteriores do registo
+        ])
+    return dtype
+
+
+def frame_groups(dtype):
+    """Número de grupos de um dtype de frame, ou None se não for um dtype de frame."""
+    if dtype.names is None or "readings" not in dtype.names:
+        return None
+    groups = dtype["readings"].shape[0]
+    return groups if dtype == frame_dtype(groups) else None
+
+
+def compute_crc(frames, algorithm="crc32"):
+    """Devolve o CRC (uint32) de cada frame, calculado sobre o registo sem o campo crc."""
+    return record_checksums(frames, algorithm, skip_tail=4)
+
+
+def check_crc(frames, algorithm="crc32"):
+    """Máscara dos frames cujo CRC corresponde ao conteúdo."""
+    return compute_crc(frames, algorithm) == frames["crc"]
+
+
+def make_frames(readings, timestamps=None, group_ids=None, stream=0):
+    """
+    Cria um lote de frames a partir de um array de leituras (T x grupos x 3 ou T x 3*grupos),
+    com o CRC já preenchido. 'stream' pode ser um id por frame.
+    """
+    readings = np.asarray(readings, dtype=np.float32)
+    count = len(readings)
+    readings = readings.reshape(count, -1, 3)
+    groups = readings.shape[1]
+    frames = np.zeros(count, dtype=frame_dtype(groups))
+    frames["timestamp"] = np.arange(count) * 0.01 if timestamps is None else timestamps
+    frames["stream"] = stream
+    frames["group_ids"] = np.arange(groups) if group_ids is None else group_ids
+    frames["readings"] = readings
+    frames["crc"] = compute_crc(frames)
+    return frames
+
+
+def frames_from_buffer(buffer, groups, count=-1, offset=0):
+    """Vista (sem cópia) sobre os frames contidos num bytes / bytearray / memoryview / mmap."""
+    return np.frombuffer(buffer, dtype=frame_dtype(groups), count=count, offset=offset)
+
+
+def validate_frames(frames, groups=None):
+    """
+    Verifica que 'frames' é um lote de frames (uma única verificação de dtype).
+    Devolve o número de grupos; levanta ValueError caso contrário.
+    """
+    if not isinstance(frames, np.ndarray) or frames.ndim != 1:
+        raise ValueError("frames deve ser um array 1-D de frames estruturados")
+    found = frame_groups(frames.dtype)
+    if found is None or (groups is not None and found != groups):
+        raise ValueError(f"dtype de frame inválido: {frames.dtype}")
+    return found
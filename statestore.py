@@ -0,0 +1,205 @@
+import array
+import threading
+
+# Estado de recuperação por sensor / fluxo (Backward Recovery, Data Redundancy).
+# Substitui as variáveis globais last_valid_distance (teste3.py), previous_distances
+# (teste2majorityvoting.py) e last_valid_values (qcsfr5.py), que colidem quando o
+# mesmo processo serve vários veículos ou câmaras.
+#
+# O estado numérico fica em colunas array.array (uma posição por chave) divididas por
+# shards. O lock de cada shard só é usado para criar uma posição nova; as atualizações
+# de um fluxo não usam locks, desde que cada fluxo tenha um único escritor (a thread ou
+# task que o processa). Fluxos diferentes podem ser atualizados em paralelo.
+
+
+class StateShard:
+    """Colunas de estado de um subconjunto das chaves."""
+
+    __slots__ = ("lock", "index", "last_valid", "age", "faults", "updates",
+                 "estimate", "error_covariance", "payload")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = {}
+        self.last_valid = array.array('d')
+        self.age = array.array('q')  # frames desde a última leitura válida
+        self.faults = array.array('q')  # leituras inválidas recuperadas
+        self.updates = array.array('q')
+        self.estimate = array.array('d')  # estado do filtro de Kalman
+        self.error_covariance = array.array('d')
+        self.payload = []  # último valor válido não numérico (ex.: parâmetros de qcsfr5)
+
+    def __len__(self):
+        return len(self.index)
+
+
+class StreamState:
+    """
+    Acesso direto ao estado de uma chave (sem procurar a chave a cada atualização).
+
+    Um StreamState deve ser usado por um único escritor; leitores concorrentes veem
+    sempre valores completos, nunca parcialmente escritos.
+    """
+
+    __slots__ = ("store", "shard", "slot", "key")
+
+    def __init__(self, store, shard, slot, key):
+        self.store = store
+        self.shard = shard
+        self.slot = slot
+        self.key = key
+
+    @property
+    def last_valid(self):
+        return self.shard.last_valid[self.slot]
+
+    @property
+    def age(self):
+        return self.shard.age[self.slot]
+
+    @property
+    def faults(self):
+        return self.shard.faults[self.slot]
+
+    @property
+    def updates(self):
+        return self.shard.updates[self.slot]
+
+    @property
+    def estimate(self):
+        return self.shard.estimate[self.slot]
+
+    @property
+    def error_covariance(self):
+        return self.shard.error_covariance[self.slot]
+
+    def store_value(self, value):
+        """Guarda 'value' como última leitura válida."""
+        shard, slot = self.shard, self.slot
+        shard.last_valid[slot] = value
+        shard.age[slot] = 0
+        shard.updates[slot] += 1
+        return value
+
+    def recover(self, value):
+        """
+        Backward Recovery: devolve 'value' se estiver no intervalo válido (e guarda-o),
+        caso contrário conta a falha e devolve a última leitura válida.
+        """
+        shard, slot = self.shard, self.slot
+        if self.store.low <= value <= self.store.high:
+            shard.last_valid[slot] = value
+            shard.age[slot] = 0
+            shard.updates[slot] += 1
+            return value
+        shard.faults[slot] += 1
+        shard.age[slot] += 1
+        return shard.last_valid[slot]
+
+    def kalman(self, measurement):
+        """Atualiza o filtro de Kalman desta chave (as mesmas equações de teste3.KalmanFilter)."""
+        shard, slot, store = self.shard, self.slot, self.store
+        estimate = shard.estimate[slot]
+        predicted_error_covariance = shard.error_covariance[slot] + store.process_variance
+        kalman_gain = predicted_error_covariance / (predicted_error_covariance + store.measurement_variance)
+        estimate += kalman_gain * (measurement - estimate)
+        shard.estimate[slot] = estimate
+        shard.error_covariance[slot] = (1 - kalman_gain) * predicted_error_covariance
+        return estimate
+
+    def remember(self, value):
+        """Guarda um último valor válido arbitrário (não numérico)."""
+        self.shard.payload[self.slot] = value
+        self.shard.age[self.slot] = 0
+        self.shard.updates[self.slot] += 1
+        return value
+
+    def recall(self, default=None):
+        value = self.shard.payload[self.slot]
+        return default if value is None else value
+
+    def reset(self):
+        shard, slot = self.shard, self.slot
+        shard.last_valid[slot] = self.store.initial_value
+        shard.age[slot] = shard.faults[slot] = shard.updates[slot] = 0
+        shard.estimate[slot] = 0.0
+        shard.error_covariance[slot] = 1.0
+        shard.payload[slot] = None
+
+
+class StateStore:
+    """
+    Estado de recuperação de muitos sensores / fluxos independentes.
+
+    Parâmetros:
+        initial_value (float): última leitura válida inicial de cada chave
+        valid_range (tuple): intervalo de leituras aceites por recover
+        shards (int): número de shards (locks independentes para a criação de chaves)
+        process_variance, measurement_variance (float): parâmetros dos filtros de Kalman
+    """
+
+    def __init__(self, initial_value=50, valid_range=(0, 100), shards=16,
+                 process_variance=1e-5, measurement_variance=1e-2):
+        if shards <= 0:
+            raise ValueError("shards deve ser positivo")
+        self.initial_value = initial_value
+        self.low, self.high = valid_range
+        self.process_variance = process_variance
+        self.measurement_variance = measurement_variance
+        self.shards = [StateShard() for _ in range(shards)]
+        self._handles = {}
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def __contains__(self, key):
+        return key in self._handles
+
+    def __getitem__(self, key):
+        """StreamState da chave, criado com os valores iniciais se ainda não existir."""
+        handle = self._handles.get(key)
+        if handle is None:
+            handle = self._create(key)
+        return handle
+
+    def _create(self, key):
+        shard = self.shards[hash(key) % len(self.shards)]
+        with shard.lock:
+            handle = self._handles.get(key)
+            if handle is not None:
+                return handle
+            slot = len(shard.index)
+            shard.last_valid.append(self.initial_value)
+            shard.age.append(0)
+            shard.faults.append(0)
+            shard.updates.append(0)
+            shard.estimate.append(0.0)
+            shard.error_covariance.append(1.0)
+            shard.payload.append(None)
+            shard.index[key] = slot
+            handle = self._handles[key] = StreamState(self, shard, slot, key)
+            return handle
+
+    def keys(self):
+        return list(self._handles)
+
+    def recover(self, key, value):
+        return self[key].recover(value)
+
+    def last_valid(self, key):
+        return self[key].last_valid
+
+    def remember(self, key, value):
+        return self[key].remember(value)
+
+    def recall(self, key, default=None):
+        handle = self._handles.get(key)
+        return default if handle is None else handle.recall(default)
+
+    def stats(self):
+        """Totais de atualizações e falhas recuperadas em todas as chaves."""
+        return {
+            "keys": len(self),
+            "updates": sum(sum(shard.updates) for shard in self.shards),
+            "faults": sum(sum(shard.faults) for shard in self.shards),
+        }
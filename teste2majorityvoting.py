@@ -42,8 +42,10 @@ def get_beep_level_without_fault_tolerance(distances, levels):
 # **DATA REDUNDANCY** - guardar valores passados
 import statistics
 from collections import Counter
+from beeplevels import level_table
+from statestore import StateStore
 
-previous_distances = []
+previous_distances = StateStore()  # última distância de cada (veículo, grupo de sensores)
 
 def majority_voting(group):
     """Aplica majority voting para obter a distância mais frequente em um grupo de 3 sensores."""
@@ -51,16 +53,11 @@ def majority_voting(group):
     most_common = counter.most_common(1)
     return most_common[0][0] if most_common else statistics.median(group)
 
-def smooth_readings(distances):
-    """Aplica uma média móvel simples para suavizar leituras."""
-    if len(distances) < 3:
-        return statistics.mean(distances)
-    window_size = min(5, len(distances))
+def smooth_readings(distances, window_size=5):
+    """Aplica uma média móvel simples (últimas 'window_size' leituras) para suavizar leituras."""
     return statistics.mean(distances[-window_size:])
 
-def get_beep_level_with_fault_tolerance(sensors, levels):
-    global previous_distances
-
+def get_beep_level_with_fault_tolerance(sensors, levels, stream=0):
     # **EXCEPTION HANDLING** - Verificação de entrada
     if not isinstance(sensors, list) or not isinstance(levels, list):
         return -1
@@ -68,10 +65,12 @@ def get_beep_level_with_fault_tolerance(sensors, levels):
         return -1  # Lista vazia ou número de sensores não é múltiplo de 3
     if not all(isinstance(d, (int, float)) and d >= 0 for d in sensors):
         return -1
-    if not all(isinstance(l, (int, float)) and l >= 0 for l in levels):
-        return -1
     if len(levels) == 0:
         return 0
+    try:
+        table = level_table(levels, "ceil")  # os níveis são validados uma só vez, ao compilar a tabela
+    except (ValueError, TypeError):
+        return -1
 
     # **REDUNDANCY AND VOTING** - Agrupar sensores em conjuntos de 3 e aplicar majority voting
     distances = []
@@ -84,12 +83,13 @@ def get_beep_level_with_fault_tolerance(sensors, levels):
     smoothed_distance = smooth_readings(distances)
 
     # **DATA REDUNDANCY** - Armazenar últimas distâncias válidas
-    previous_distances = distances.copy()
+    for group, distance in enumerate(distances):
+        previous_distances[stream, group].store_value(distance)
 
     # **SOFTWARE REDUNDANCY** - Determinar o beep level por dois métodos
     min_distance = min(distances)
-    method_1 = next((i for i, level in enumerate(levels) if min_distance <= level), len(levels))
-    method_2 = next((i for i, level in enumerate(levels) if smoothed_distance <= level), len(levels))
+    method_1 = table.lookup(min_distance)
+    method_2 = table.lookup(smoothed_distance)
 
     # **GRACEFUL DEGRADATION** - Garantir o beep level mais seguro (mínimo dos dois)
     return min(method_1, method_2)
@@ -1,5 +1,10 @@
 import statistics
 import random
+import numpy as np
+from beeplevels import level_table
+from outliers import reject_outliers
+from integrity import checksum_bytes, pack_readings
+from statestore import StateStore
 
 # Filtro de Kalman para suavizar leituras dos sensores
 class KalmanFilter:
@@ -19,12 +24,90 @@ class KalmanFilter:
 
         return self.estimate
 
-# Information Redundancy: Checksum para garantir a integridade dos dados
-def checksum(data):
-    return sum(data) % 256
-
-def is_valid_data(sensors):
-    expected_checksum = checksum(sensors[:-1])
+# Banco de N filtros de Kalman escalares, com estimativas e covariâncias em arrays NumPy
+class KalmanFilterBank:
+    def __init__(self, size, process_variance=1e-5, measurement_variance=1e-2):
+        self.estimates = np.zeros(size)
+        self.error_covariances = np.ones(size)
+        self.process_variance = process_variance
+        self.measurement_variance = measurement_variance
+        self._gain = np.empty(size)
+
+    def __len__(self):
+        return len(self.estimates)
+
+    def update(self, measurements):
+        """Atualiza os N filtros com um vetor de N medições. Devolve as N estimativas."""
+        gain = self._gain
+        # Predição
+        np.add(self.error_covariances, self.process_variance, out=self.error_covariances)
+        # Atualização
+        np.add(self.error_covariances, self.measurement_variance, out=gain)
+        np.divide(self.error_covariances, gain, out=gain)
+        self.estimates += gain * (np.asarray(measurements, dtype=np.float64) - self.estimates)
+        self.error_covariances *= 1 - gain
+        return self.estimates
+
+    def filter_series(self, series, block=128):
+        """
+        Filtra uma gravação (T x N) completa e devolve as estimativas (T x N).
+
+        Os ganhos não dependem das medições: são calculados primeiro, até convergirem.
+        Na fase transitória a correção é aplicada passo a passo (vetorizada sobre os N
+        filtros); com o ganho constante, x[t] = (1 - K) x[t-1] + K z[t] é um filtro IIR
+        de 1ª ordem, aplicado por blocos de 'block' passos com um produto de matrizes.
+        """
+        series = np.asarray(series, dtype=np.float64)
+        steps = len(series)
+        out = np.empty((steps, len(self)))
+
+        # Ganhos da fase transitória (até o ganho deixar de mudar)
+        gains = []
+        covariance = self.error_covariances.copy()
+        steady = None
+        for t in range(steps):
+            predicted = covariance + self.process_variance
+            gain = predicted / (predicted + self.measurement_variance)
+            covariance = (1 - gain) * predicted
+            if gains and np.array_equal(gain, gains[-1]):
+                steady = gain
+                break
+            gains.append(gain)
+        self.error_covariances = covariance
+
+        estimate = self.estimates.copy()
+        for t, gain in enumerate(gains):
+            estimate += gain * (series[t] - estimate)
+            out[t] = estimate
+
+        start = len(gains)
+        if steady is not None:
+            # Fase estacionária: um bloco de cada vez, por grupo de filtros com o mesmo ganho
+            for k in np.unique(steady):
+                columns = np.flatnonzero(steady == k)
+                a = 1.0 - k
+                lags = np.subtract.outer(np.arange(block), np.arange(block))
+                mixing = np.where(lags >= 0, k * a ** np.maximum(lags, 0), 0.0)
+                decay = a ** np.arange(1, block + 1)
+                state = estimate[columns]
+                for t in range(start, steps, block):
+                    n = min(block, steps - t)
+                    chunk = mixing[:n, :n] @ series[t:t + n, columns] + decay[:n, None] * state
+                    out[t:t + n, columns] = chunk
+                    state = chunk[-1]
+                estimate[columns] = state
+        self.estimates = estimate
+        return out
+
+
+# Information Redundancy: CRC (integrity.py) sobre as leituras empacotadas para garantir a integridade dos dados
+def checksum(data, algorithm="crc32"):
+    return checksum_bytes(pack_readings(data), algorithm)
+
+def is_valid_data(sensors, algorithm="crc32"):
+    # o último elemento é o checksum; as leituras são verificadas sobre o buffer empacotado, sem copiar a lista
+    packed = pack_readings(sensors)
+    expected_checksum = checksum_bytes(memoryview(packed)[:-1], algorithm)
     return expected_checksum == sensors[-1]
 
 # Retry Mechanism para leituras falhadas
@@ -35,16 +118,15 @@ def safe_reading(sensor_func, retries=3):
             return reading
     return -1  # Falha após várias tentativas
 
-# Backward Recovery: Utilizar a última leitura válida se houver falha
-last_valid_distance = 50  # Valor inicial seguro
+# Backward Recovery: Utilizar a última leitura válida (de cada sensor de cada veículo) se houver falha
+sensor_state = StateStore(initial_value=50)  # Valor inicial seguro, por (fluxo, sensor)
 
-def get_distance_with_backup(current_distance):
-    global last_valid_distance
-    if 0 <= current_distance <= 100:
-        last_valid_distance = current_distance
-        return current_distance
-    print(f"⚠️ Falha na leitura ({current_distance}), utilizando valor anterior: {last_valid_distance}")
-    return last_valid_distance
+def get_distance_with_backup(current_distance, sensor=0, stream=0):
+    state = sensor_state[stream, sensor]
+    distance = state.recover(current_distance)
+    if distance != current_distance:
+        print(f"⚠️ Falha na leitura ({current_distance}), utilizando valor anterior: {distance}")
+    return distance
 
 def majority_voting(distances):
     most_common = max(set(distances), key=distances.count)
@@ -53,21 +135,24 @@ def majority_voting(distances):
     else:
         return statistics.median(distances)
 
-def get_beep_level_with_fault_tolerance(sensors, levels):
+def get_beep_level_with_fault_tolerance(sensors, levels, expected_checksum=None, stream=0):
     if not isinstance(sensors, list) or not isinstance(levels, list) or len(sensors) % 3 != 0:
         return -1
 
     if not all(isinstance(d, (int, float)) and d >= 0 for d in sensors):
         return -1
 
-    if not all(isinstance(l, (int, float)) and l >= 0 for l in levels):
+    if len(levels) == 0 or len(sensors) == 0:
         return -1
 
-    if len(levels) == 0 or len(sensors) == 0:
+    # Os níveis são validados uma só vez, quando a tabela é compilada
+    try:
+        table = level_table(levels, "floor")
+    except (ValueError, TypeError):
         return -1
 
-    # Verificar integridade com checksum
-    if not is_valid_data(sensors + [checksum(sensors)]):
+    # Verificar integridade com o checksum enviado junto com as leituras (se existir)
+    if expected_checksum is not None and checksum(sensors) != expected_checksum:
         print("⚠️ Falha de integridade dos dados (checksum inválido).")
         return -1
 
@@ -85,20 +170,18 @@ def get_beep_level_with_fault_tolerance(sensors, levels):
     smoothed_distances = []
     for i, group in enumerate(grouped_sensors):
         valid_distance = majority_voting(group)
-        safe_distance = get_distance_with_backup(valid_distance)
+        safe_distance = get_distance_with_backup(valid_distance, sensor=i, stream=stream)
         smoothed_distance = kalman_filters[i].update(safe_distance)
         smoothed_distances.append(smoothed_distance)
 
     max_change = 50
-    valid_distances = [
-        dist for dist in smoothed_distances if abs(dist - statistics.median(smoothed_distances)) <= max_change
-    ]
+    valid_distances = reject_outliers(smoothed_distances, max_change)
 
     if len(valid_distances) < len(smoothed_distances) // 2:
         return -1
 
     min_distance = min(valid_distances)
-    beep_level = next((i for i, level in reversed(list(enumerate(levels))) if level <= min_distance), 0)
+    beep_level = table.lookup(min_distance)
     return beep_level
 
 # Simulação para testar o sistema com fault tolerance melhorado
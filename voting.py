@@ -0,0 +1,48 @@
+import numpy as np
+
+# Majority voting vetorizado sobre arrays (N x 3) de leituras de sensores.
+# Equivalente, linha a linha, às funções majority_voting de qcsfr4.py / teste3.py
+# (fallback "median") e de teste2majorityvoting.py (fallback "first"), mas sem
+# set, Counter nem list.count: só comparações e np.where.
+
+FALLBACKS = ("median", "first")
+
+
+def median3(a, b, c):
+    """Mediana de três arrays, elemento a elemento, sem ordenar nem ramificar."""
+    return np.maximum(np.minimum(a, b), np.minimum(np.maximum(a, b), c))
+
+
+def majority_voting_array(readings, tolerance=0, fallback="median", return_agreement=False):
+    """
+    Aplica o majority voting a cada linha de um array (N x 3).
+
+    Parâmetros:
+        readings (array): N triplos de leituras
+        tolerance (int ou float): duas leituras concordam se |a - b| <= tolerance
+                                  (0 = igualdade exata, como nas funções originais)
+        fallback (str): sem maioria, "median" devolve a mediana (qcsfr4.py / teste3.py)
+                        e "first" a primeira leitura (teste2majorityvoting.py)
+        return_agreement (bool): devolve também a máscara das linhas com maioria
+
+    Retorna:
+        array: N distâncias votadas (e a máscara de concordância, se pedida)
+    """
+    if fallback not in FALLBACKS:
+        raise ValueError(f"fallback deve ser um de {FALLBACKS}")
+    readings = np.asarray(readings)
+    if readings.ndim != 2 or readings.shape[1] != 3:
+        raise ValueError("readings deve ter a forma (N, 3)")
+    a, b, c = readings[:, 0], readings[:, 1], readings[:, 2]
+    if tolerance:
+        ab = np.abs(a - b) <= tolerance
+        ac = np.abs(a - c) <= tolerance
+        bc = np.abs(b - c) <= tolerance
+    else:
+        ab, ac, bc = a == b, a == c, b == c
+    first_agrees = ab | ac
+    default = median3(a, b, c) if fallback == "median" else a
+    voted = np.where(first_agrees, a, np.where(bc, b, default))
+    if return_agreement:
+        return voted, first_agrees | bc
+    return voted